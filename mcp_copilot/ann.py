@@ -0,0 +1,265 @@
+import logging
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from mcp_copilot.index import atomic_write, index_paths, top_k_indices
+
+logger = logging.getLogger(__name__)
+
+ANN_VERSION = 1
+
+
+class ExactSearch:
+    """Brute-force inner-product search over every indexed row.
+
+    This is the reference backend: its results are exact and the approximate
+    backends are measured against it.
+    """
+
+    name = "exact"
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray | None = None):
+        self.vectors = vectors
+        self.ids = ids
+
+    @classmethod
+    def build(
+        cls, vectors: np.ndarray, ids: np.ndarray | None = None, **params: Any
+    ) -> "ExactSearch":
+        return cls(vectors, ids)
+
+    def search(
+        self, query: np.ndarray, k: int, **params: Any
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(row_ids, scores)`` of the ``k`` best rows, best first."""
+        if self.ids is None:
+            scores = self.vectors @ query
+            top = top_k_indices(scores, k)
+            return top, scores[top]
+        scores = self.vectors[self.ids] @ query
+        top = top_k_indices(scores, k)
+        return self.ids[top], scores[top]
+
+
+class IVFFlatSearch:
+    """Inverted-file index with spherical k-means centroids, pure NumPy.
+
+    Rows are clustered into ``n_lists`` lists at build time. A query scores
+    the centroids, then scans only the rows of the ``nprobe`` closest lists
+    exactly. Raising ``nprobe`` trades latency for recall; ``nprobe ==
+    n_lists`` is equivalent to exact search.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        list_ids: np.ndarray,
+        list_offsets: np.ndarray,
+        nprobe: int = 8,
+    ):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_ids = list_ids
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        ids: np.ndarray | None = None,
+        n_lists: int | None = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        max_train_per_list: int = 64,
+        seed: int = 0,
+        **params: Any,
+    ) -> "IVFFlatSearch":
+        if ids is None:
+            ids = np.arange(vectors.shape[0])
+        ids = np.asarray(ids, dtype=np.int64)
+        n = len(ids)
+        if not n_lists:
+            n_lists = max(1, int(np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        train_size = min(n, n_lists * max_train_per_list)
+        train_ids = np.sort(rng.choice(ids, size=train_size, replace=False))
+        train = np.asarray(vectors[train_ids], dtype=np.float32)
+        centroids = _spherical_kmeans(train, n_lists, iterations, rng)
+
+        assignment = _assign(vectors, ids, centroids)
+        order = np.argsort(assignment, kind="stable")
+        list_ids = ids[order]
+        list_offsets = np.searchsorted(
+            assignment[order], np.arange(n_lists + 1), side="left"
+        ).astype(np.int64)
+        return cls(vectors, centroids, list_ids, list_offsets, nprobe=nprobe)
+
+    def search(
+        self, query: np.ndarray, k: int, nprobe: int | None = None, **params: Any
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(row_ids, scores)`` of the best ``k`` rows among the probed lists."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        probes = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.concatenate(
+            [
+                self.list_ids[self.list_offsets[p] : self.list_offsets[p + 1]]
+                for p in probes
+            ]
+        )
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        rows.sort()
+        scores = self.vectors[rows] @ query
+        top = top_k_indices(scores, k)
+        return rows[top], scores[top]
+
+    def save(self, path: str | Path, source: Any = None) -> None:
+        with atomic_write(path) as f:
+            np.savez(
+                f,
+                version=ANN_VERSION,
+                source=np.asarray(repr(source)),
+                num_rows=self.vectors.shape[0],
+                centroids=self.centroids,
+                list_ids=self.list_ids,
+                list_offsets=self.list_offsets,
+            )
+
+    @classmethod
+    def load(
+        cls, path: str | Path, vectors: np.ndarray, source: Any = None, nprobe: int = 8
+    ) -> "IVFFlatSearch | None":
+        """Load a saved index, or ``None`` if it was built from other vectors."""
+        with np.load(path) as data:
+            if (
+                int(data["version"]) != ANN_VERSION
+                or str(data["source"]) != repr(source)
+                or int(data["num_rows"]) != vectors.shape[0]
+            ):
+                return None
+            return cls(
+                vectors,
+                data["centroids"],
+                data["list_ids"],
+                data["list_offsets"],
+                nprobe=nprobe,
+            )
+
+
+def ann_path(
+    data_path: str | Path, stage: str, backend: str, dimensions: int | None = None
+) -> Path:
+    """Where the ANN index of one stage is saved, next to the catalog."""
+    vectors_path, _ = index_paths(data_path, dimensions)
+    stem = vectors_path.name[: -len(".vectors.npy")]
+    return vectors_path.parent / f"{stem}.{stage}.{backend}.npz"
+
+
+SEARCH_BACKENDS = {
+    ExactSearch.name: ExactSearch,
+    IVFFlatSearch.name: IVFFlatSearch,
+}
+
+
+def build_search(
+    backend: str,
+    vectors: np.ndarray,
+    ids: np.ndarray | None = None,
+    path: str | Path | None = None,
+    source: Any = None,
+    **params: Any,
+) -> ExactSearch | IVFFlatSearch:
+    """Create a search backend over ``vectors``.
+
+    For persistable backends, an index saved at ``path`` is reused when it was
+    built from the same ``source``; otherwise it is built and saved there.
+    """
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(
+            f"Unknown search backend '{backend}', "
+            f"expected one of {sorted(SEARCH_BACKENDS)}"
+        )
+    search_cls = SEARCH_BACKENDS[backend]
+    if search_cls is ExactSearch:
+        return ExactSearch.build(vectors, ids)
+
+    # nprobe is a query-time knob; every other parameter changes the build
+    if source is not None:
+        source = {
+            "source": source,
+            "params": {k: v for k, v in sorted(params.items()) if k != "nprobe"},
+        }
+    if path is not None and source is not None and Path(path).exists():
+        try:
+            search = search_cls.load(
+                path, vectors, source=source, nprobe=params.get("nprobe", 8)
+            )
+            if search is not None:
+                return search
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable ANN index {path}: {e}")
+
+    search = search_cls.build(vectors, ids, **params)
+    if path is not None and source is not None:
+        try:
+            search.save(path, source=source)
+        except OSError as e:
+            logger.warning(f"Could not save ANN index to {path}: {e}")
+    return search
+
+
+def recall_at_k(
+    approximate: ExactSearch | IVFFlatSearch,
+    exact: ExactSearch,
+    queries: np.ndarray,
+    k: int,
+    **params: Any,
+) -> float:
+    """Average fraction of the exact top-``k`` rows the approximate backend finds."""
+    found = 0
+    total = 0
+    for query in queries:
+        expected = set(exact.search(query, k)[0].tolist())
+        got = set(approximate.search(query, k, **params)[0].tolist())
+        found += len(expected & got)
+        total += len(expected)
+    return found / total if total else 1.0
+
+
+def _spherical_kmeans(
+    train: np.ndarray, n_lists: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    centroids = train[rng.choice(len(train), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(train @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, train)
+        counts = np.bincount(assignment, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.divide(sums, norms, out=sums, where=norms > 0)
+    return centroids
+
+
+def _assign(
+    vectors: np.ndarray, ids: np.ndarray, centroids: np.ndarray, chunk: int = 8192
+) -> np.ndarray:
+    assignment = np.empty(len(ids), dtype=np.int64)
+    for start in range(0, len(ids), chunk):
+        block = np.asarray(vectors[ids[start : start + chunk]], dtype=np.float32)
+        assignment[start : start + chunk] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
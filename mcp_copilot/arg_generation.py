@@ -1,7 +1,11 @@
+import argparse
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import sqlite3
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict, List
 from dotenv import load_dotenv
@@ -10,6 +14,16 @@ from tqdm import tqdm
 import mcp.types as types
 import openai
 
+from mcp_copilot.embedding_batcher import EmbeddingBatcher
+from mcp_copilot.embedding_cache import EmbeddingStore, embedding_key
+from mcp_copilot.index import CatalogIndex, index_is_current, source_signature
+from mcp_copilot.rate_limit import rate_limit_stats, rate_limiter
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent runs are not serialized
+    fcntl = None
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -18,6 +32,17 @@ embedding_api_key = os.getenv("EMBEDDING_API_KEY")
 embedding_model = os.getenv("EMBEDDING_MODEL")
 embedding_api_url = os.getenv("EMBEDDING_BASE_URL")
 embedding_dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+# request EMBEDDING_DIMENSIONS from the API (Matryoshka models such as
+# text-embedding-3) instead of the model's full size
+reduce_dimensions = os.getenv("EMBEDDING_REDUCE_DIMENSIONS", "0") == "1"
+# servers summarized and embedded at the same time
+index_concurrency = int(os.getenv("INDEX_CONCURRENCY", "8"))
+# texts from concurrent servers are packed into batched embedding requests
+embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+embedding_batch_tokens = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+embedding_concurrency = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+# attempts per embedding or summary request on throttling and server errors
+api_max_retries = int(os.getenv("API_MAX_RETRIES", "5"))
 
 abstract_api_key = os.getenv("ABSTRACT_API_KEY")
 abstract_model = os.getenv("ABSTRACT_MODEL")
@@ -30,6 +55,23 @@ DEFAULT_CONFIG_PATH = Path("./tools/LiveMCPTool/tools.json")
 DEFAULT_OUTPUT_PATH = Path(
     PROJECT_ROOT / "config" / f"mcp_arg_{embedding_model}_{abstract_model}.json"
 )
+# embeddings shared by every index build, whatever the summary model or output
+# file; keyed by (model, dimensions, text), set to an empty string to disable
+DEFAULT_STORE_PATH = os.getenv(
+    "EMBEDDING_STORE_PATH", str(PROJECT_ROOT / "config" / "embeddings.sqlite")
+)
+# placeholder that older builds stored in place of a failed summary
+SUMMARY_ERROR_PREFIX = "Error generating summary for "
+
+
+def content_hash(value: Any) -> str:
+    """Short stable hash of JSON-serializable content, for change detection."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def tool_content_hash(tool: types.Tool) -> str:
+    return content_hash({"description": tool.description, "schema": tool.inputSchema})
 
 
 class McpArgGenerator:
@@ -37,8 +79,14 @@ class McpArgGenerator:
         self,
         config: List[Dict[str, Any]] | Path,
         output_file: str | Path,
+        concurrency: int = index_concurrency,
+        store_path: str | Path | None = DEFAULT_STORE_PATH,
     ):
         self.output_file = Path(output_file)
+        self.concurrency = max(1, concurrency)
+        self.store = EmbeddingStore(store_path) if store_path else None
+        self.store_hits = 0
+        self.store_misses = 0
 
         if isinstance(config, List):
             self.config = config
@@ -49,12 +97,16 @@ class McpArgGenerator:
                 self.config = json.load(f)
         else:
             raise TypeError("Config must be a dictionary or a Path to a JSON file.")
+        # retries and 429 backoff are left to the shared rate limiters
         self.embedding_client = openai.AsyncOpenAI(
-            api_key=embedding_api_key, base_url=embedding_api_url
+            api_key=embedding_api_key, base_url=embedding_api_url, max_retries=0
         )
         self.summary_client = openai.AsyncOpenAI(
-            api_key=abstract_api_key, base_url=abstract_api_url
+            api_key=abstract_api_key, base_url=abstract_api_url, max_retries=0
         )
+        self.embedding_limiter = rate_limiter("embedding")
+        self.summary_limiter = rate_limiter("summary")
+        self._batchers: Dict[str, EmbeddingBatcher] = {}
 
     async def _get_embedding(
         self, text: str, model: str = embedding_model
@@ -62,24 +114,98 @@ class McpArgGenerator:
         if not text:
             logger.warning("Empty text provided for embedding, returning empty list.")
             return []
-        try:
-            response = await self.embedding_client.embeddings.create(
-                model=model,
-                input=[text],
-                encoding_format="float",
+        if self.store is not None:
+            stored = self.store.get(self._store_key(text, model))
+            if stored is not None:
+                self.store_hits += 1
+                return stored.tolist()
+        self.store_misses += 1
+        batcher = self._batchers.get(model)
+        if batcher is None:
+            batcher = self._batchers[model] = EmbeddingBatcher(
+                partial(self._embed_batch, model=model),
+                max_batch_size=embedding_batch_size,
+                max_batch_tokens=embedding_batch_tokens,
+                max_in_flight=embedding_concurrency,
             )
-            return response.data[0].embedding
+        try:
+            return await batcher.embed(text)
         except Exception as e:
             logger.error(f"Embedding Error: {e}")
             return []
 
+    async def _embed_batch(self, texts: List[str], model: str) -> List[List[float]]:
+        """One ``embeddings.create`` request for ``texts``, in input order.
+
+        A rejected input fails the whole request, so a rejected batch is split
+        in halves until the offending text is isolated; it gets an empty list.
+        """
+        extra_args = {"dimensions": embedding_dimensions} if reduce_dimensions else {}
+        try:
+            response = await self.embedding_limiter.acall(
+                partial(
+                    self.embedding_client.embeddings.create,
+                    model=model,
+                    input=texts,
+                    encoding_format="float",
+                    **extra_args,
+                ),
+                max_retries=api_max_retries,
+            )
+        except openai.BadRequestError as e:
+            if len(texts) == 1:
+                logger.error(f"Embedding Error: {e}")
+                return [[]]
+            middle = len(texts) // 2
+            first, second = await asyncio.gather(
+                self._embed_batch(texts[:middle], model),
+                self._embed_batch(texts[middle:], model),
+            )
+            return first + second
+        vectors = [
+            item.embedding for item in sorted(response.data, key=lambda d: d.index)
+        ]
+        if self.store is not None:
+            dimensions = embedding_dimensions if reduce_dimensions else None
+            rows = [
+                (self._store_key(text, model), model, dimensions, vector)
+                for text, vector in zip(texts, vectors)
+                if vector
+            ]
+            try:
+                self.store.put_many(rows)
+            except sqlite3.Error as e:
+                logger.warning(
+                    f"Failed to persist embeddings to {self.store.path}: {e}"
+                )
+        return vectors
+
+    @staticmethod
+    def _store_key(text: str, model: str) -> str:
+        dimensions = embedding_dimensions if reduce_dimensions else None
+        return embedding_key(model, dimensions, text)
+
+    def embedding_stats(self) -> Dict[str, Any]:
+        """Store hits, texts sent to the API and texts shared within a batch."""
+        sent = sum(batcher.texts for batcher in self._batchers.values())
+        lookups = self.store_hits + self.store_misses
+        return {
+            "store_hits": self.store_hits,
+            "store_misses": self.store_misses,
+            "hit_rate": self.store_hits / lookups if lookups else 0.0,
+            "deduplicated": self.store_misses - sent,
+            "embedded": sent,
+            "requests": sum(b.requests for b in self._batchers.values()),
+        }
+
     async def _generate_summary(
         self,
         server_name: str,
         server_desc: str,
         tools: List[types.Tool],
         model: str = abstract_model,
-    ) -> str:
+    ) -> str | None:
+        """The server summary, or ``None`` if it could not be generated."""
         tool_descriptions = "\n".join(
             [f"- {tool.name}: {tool.description}" for tool in tools]
         )
@@ -97,21 +223,178 @@ You are an expert AI technical writer. Based on the following information about
 Please return only the generated summary text, without any additional titles or preambles.
 """
         try:
-            response = await self.summary_client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert technical writer.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.2,
+            response = await self.summary_limiter.acall(
+                partial(
+                    self.summary_client.chat.completions.create,
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are an expert technical writer.",
+                        },
+                        {"role": "user", "content": prompt},
+                    ],
+                    temperature=0.2,
+                ),
+                max_retries=api_max_retries,
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"Summary Generation Error for '{server_name}': {e}")
-            return f"Error generating summary for {server_name}"
+            return None
+
+    @staticmethod
+    def _has_summary(entry: Dict[str, Any]) -> bool:
+        summary = entry.get("server_summary")
+        return bool(summary) and not summary.startswith(SUMMARY_ERROR_PREFIX)
+
+    def _server_tools(self, server: Dict[str, Any]) -> List[types.Tool]:
+        server_name = list(server["config"]["mcpServers"].keys())[0]
+        return [
+            types.Tool(**tool)
+            for tool in server["tools"].get(server_name, {}).get("tools", [])
+        ]
+
+    def _is_current(self, server: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+        """Whether ``entry`` still matches ``server`` and has every embedding.
+
+        Entries written before hashes were recorded are compared on their
+        stored text instead, and get their hashes stamped when they match.
+        """
+        tools = self._server_tools(server)
+        stored_tools = entry.get("tools") or []
+        if [t.name for t in tools] != [t.get("name") for t in stored_tools]:
+            return False
+        if (
+            not self._has_summary(entry)
+            or not entry.get("summary_embedding")
+            or (server["description"] and not entry.get("description_embedding"))
+        ):
+            return False
+        if "description_hash" in entry:
+            if entry["description_hash"] != content_hash(server["description"]):
+                return False
+        elif entry.get("server_description") != server["description"]:
+            return False
+        for tool, stored in zip(tools, stored_tools):
+            if tool.description and not stored.get("description_embedding"):
+                return False
+            if "content_hash" in stored:
+                if stored["content_hash"] != tool_content_hash(tool):
+                    return False
+            elif stored.get("description") != tool.description or stored.get(
+                "parameter"
+            ) != self._format_tool_parameters(tool):
+                return False
+
+        entry["description_hash"] = content_hash(server["description"])
+        for tool, stored in zip(tools, stored_tools):
+            stored["content_hash"] = tool_content_hash(tool)
+        return True
+
+    async def _index_server(
+        self, server: Dict[str, Any], previous: Dict[str, Any] | None = None
+    ) -> Dict[str, Any] | None:
+        """Summarize and embed one catalog entry; ``None`` if it failed.
+
+        With the ``previous`` entry of the same server, only what changed is
+        redone: the summary is kept unless the description or the tool list
+        changed, and embeddings of unchanged, non-empty texts are reused.
+        """
+        server_name = list(server["config"]["mcpServers"].keys())[0]
+        tools = self._server_tools(server)
+        server_description = server["description"]
+        previous = previous or {}
+        previous_tools = {t.get("name"): t for t in previous.get("tools") or []}
+        logger.info(
+            f"{'Re-indexing' if previous else 'Indexing'} server: {server_name}"
+        )
+
+        def reuse(old: Dict[str, Any] | None, key: str, text: str, new_text: str):
+            if old and text == new_text and old.get(key):
+                return old[key]
+            return None
+
+        try:
+            summary_inputs = [(t.name, t.description) for t in tools]
+            previous_inputs = [
+                (t.get("name"), t.get("description"))
+                for t in previous.get("tools") or []
+            ]
+            if (
+                self._has_summary(previous)
+                and previous.get("server_description") == server_description
+                and previous_inputs == summary_inputs
+            ):
+                server_summary = previous["server_summary"]
+            else:
+                server_summary = await self._generate_summary(
+                    server_name, server_description, tools
+                )
+                if server_summary is None:
+                    # not recorded, so the server is summarized again next run
+                    return None
+            embedding_tasks = {}
+            reused = {
+                "server_desc": reuse(
+                    previous,
+                    "description_embedding",
+                    previous.get("server_description"),
+                    server_description,
+                ),
+                "server_summary": reuse(
+                    previous,
+                    "summary_embedding",
+                    previous.get("server_summary"),
+                    server_summary,
+                ),
+            }
+            for i, tool in enumerate(tools):
+                old = previous_tools.get(tool.name)
+                reused[f"tool_{i}"] = reuse(
+                    old,
+                    "description_embedding",
+                    old.get("description") if old else None,
+                    tool.description,
+                )
+            texts = {
+                "server_desc": server_description,
+                "server_summary": server_summary,
+                **{f"tool_{i}": tool.description for i, tool in enumerate(tools)},
+            }
+            for key, text in texts.items():
+                if reused[key] is None:
+                    embedding_tasks[key] = self._get_embedding(text)
+
+            embeddings_results = await asyncio.gather(*embedding_tasks.values())
+            embeddings = {key: value for key, value in reused.items() if value}
+            embeddings.update(zip(embedding_tasks.keys(), embeddings_results))
+
+            formatted_tools = []
+            for i, tool in enumerate(tools):
+                formatted_tools.append(
+                    {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "description_embedding": embeddings.get(f"tool_{i}", []),
+                        "parameter": self._format_tool_parameters(tool),
+                        "content_hash": tool_content_hash(tool),
+                    }
+                )
+
+            return {
+                "server_name": server_name,
+                "server_summary": server_summary,
+                "server_description": server_description,
+                "category": server.get("category"),
+                "description_hash": content_hash(server_description),
+                "description_embedding": embeddings.get("server_desc", []),
+                "summary_embedding": embeddings.get("server_summary", []),
+                "tools": formatted_tools,
+            }
+        except Exception as e:
+            logger.error(f"Error processing server '{server_name}': {e}")
+            return None
 
     def _format_tool_parameters(self, tool: types.Tool) -> Dict[str, str]:
         formatted_params = {}
@@ -132,21 +415,72 @@ Please return only the generated summary text, without any additional titles or
                 formatted_params[param_name] = f"({param_type}) {param_desc}"
         return formatted_params
 
-    async def generate(self) -> None:
-        existing_servers_info = []
-        existing_server_names = set()
+    @property
+    def checkpoint_file(self) -> Path:
+        """Append-only log of servers indexed since the output was last compacted."""
+        return self.output_file.with_name(self.output_file.stem + ".checkpoint.jsonl")
+
+    def _save_servers_info(self, servers_info: List[Dict[str, Any]]) -> None:
+        """Atomically replace the output file with ``servers_info``."""
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.output_file.with_name(self.output_file.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(servers_info, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.output_file)
+
+    def _read_checkpoint(self) -> List[Dict[str, Any]]:
+        """Servers recorded in the checkpoint log; a torn last line is skipped."""
+        entries = []
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(
+                            f"Ignoring unreadable line {line_number} of "
+                            f"{self.checkpoint_file}"
+                        )
+        except FileNotFoundError:
+            pass
+        except IOError as e:
+            logger.error(f"Error reading checkpoint {self.checkpoint_file}: {e}")
+        return entries
+
+    def _open_checkpoint(self):
+        self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+        # a crash may have left a partial line; start the next entry on its own
+        if self.checkpoint_file.exists():
+            with open(self.checkpoint_file, "rb+") as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+        return open(self.checkpoint_file, "a", encoding="utf-8")
+
+    def _write_index(self, servers_info: List[Dict[str, Any]]) -> None:
+        """Export the binary index next to the JSON output for fast matcher startup."""
+        try:
+            CatalogIndex.from_servers(servers_info).save(
+                self.output_file, source=source_signature(self.output_file)
+            )
+        except (OSError, ValueError) as e:
+            logger.error(f"Error writing binary index for {self.output_file}: {e}")
 
+    def _load_existing(self) -> List[Dict[str, Any]]:
+        existing_servers_info = []
         if self.output_file.exists():
             try:
                 with open(self.output_file, "r", encoding="utf-8") as f:
                     content = json.load(f)
                     if isinstance(content, list):
                         existing_servers_info = content
-                        for server_data in existing_servers_info:
-                            if "server_name" in server_data:
-                                existing_server_names.add(server_data["server_name"])
                         logger.info(
-                            f"loaded {len(existing_server_names)} existing server from {self.output_file}."
+                            f"loaded {len(existing_servers_info)} existing server from {self.output_file}."
                         )
                     else:
                         logger.warning(
@@ -156,88 +490,216 @@ Please return only the generated summary text, without any additional titles or
                 logger.error(
                     f"Error reading existing servers from {self.output_file}: {e}"
                 )
+        return existing_servers_info
+
+    @property
+    def lock_file(self) -> Path:
+        """Held by the run that is writing the output and its checkpoint log."""
+        return self.output_file.with_name(self.output_file.name + ".lock")
+
+    async def generate(self, wait: bool = True) -> bool:
+        """Run ``_generate`` under an exclusive lock on ``lock_file``.
+
+        Concurrent runs on the same output would repeat the same API calls
+        and could remove the checkpoint log while another is appending to it.
+        Without ``wait``, returns False at once if another run holds the lock.
+        """
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    if not wait:
+                        logger.info(
+                            f"Another run is indexing {self.output_file}, skipping."
+                        )
+                        return False
+                    logger.info(f"Waiting for another run indexing {self.output_file}")
+                    await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            # the lock is released when the file is closed
+            await self._generate()
+        return True
+
+    async def _generate(self) -> None:
+        """Bring the output up to date with the config.
+
+        Servers are matched by name. New servers are indexed; servers whose
+        description, tools or tool schemas changed (by content hash), or that
+        are missing an embedding, are re-indexed incrementally; servers no
+        longer in the config are pruned; everything else is kept as is.
+
+        Each indexed server is appended as one line to ``checkpoint_file``, so
+        progress costs O(1) writes per server and survives a crash. At the end
+        the output and the log are compacted into a new output file that
+        atomically replaces the old one, and the log is removed. An interrupted
+        run resumes from the output plus the log.
+        """
+        existing_servers_info = self._load_existing()
+        positions = {
+            server_data.get("server_name"): i
+            for i, server_data in enumerate(existing_servers_info)
+        }
+        compact = False
+        checkpointed = 0
+        # the log is newer than the output: its entries replace or extend it
+        for server_data in self._read_checkpoint():
+            name = server_data.get("server_name")
+            if name in positions:
+                existing_servers_info[positions[name]] = server_data
+            else:
+                positions[name] = len(existing_servers_info)
+                existing_servers_info.append(server_data)
+            checkpointed += 1
+            compact = True
+        if checkpointed:
+            logger.info(
+                f"Resuming with {checkpointed} servers from {self.checkpoint_file}."
+            )
 
-        all_servers_info = existing_servers_info.copy()
+        config_names = {
+            list(server["config"]["mcpServers"].keys())[0] for server in self.config
+        }
+        all_servers_info = [
+            server_data
+            for server_data in existing_servers_info
+            if server_data.get("server_name") in config_names
+        ]
+        pruned = len(existing_servers_info) - len(all_servers_info)
+        if pruned:
+            logger.info(f"Pruning {pruned} servers that are no longer configured.")
+            compact = True
+        positions = {
+            server_data.get("server_name"): i
+            for i, server_data in enumerate(all_servers_info)
+        }
+
+        pending = []
+        for server in self.config:
+            name = list(server["config"]["mcpServers"].keys())[0]
+            if name not in positions:
+                pending.append((server, None))
+                continue
+            entry = all_servers_info[positions[name]]
+            unstamped = "description_hash" not in entry
+            if not self._is_current(server, entry):
+                pending.append((server, entry))
+                continue
+            compact = compact or unstamped
+            # catalogs indexed before categories were recorded get them backfilled
+            if server.get("category") and entry.get("category") != server["category"]:
+                entry["category"] = server["category"]
+                compact = True
+        changed = sum(1 for _, previous in pending if previous is not None)
+        if changed:
+            logger.info(f"{changed} indexed servers changed and will be re-indexed.")
         new_servers_processed_count = 0
 
-        for server in tqdm(self.config):
-            server_config = server["config"]["mcpServers"]
-            server_name = list(server_config.keys())[0]
-            if server_name in existing_server_names:
-                continue
-            tools = [
-                types.Tool(**tool)
-                for tool in server["tools"].get(server_name, {}).get("tools", [])
-            ]
-            server_description = server["description"]
-            logger.info(f"Indexing server: {server_name}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def index_in_slot(
+            position: int, server: Dict[str, Any], previous: Dict[str, Any] | None
+        ):
+            async with semaphore:
+                return position, await self._index_server(server, previous)
+
+        # servers are indexed concurrently but logged in config order: a
+        # finished server waits until every server before it is done
+        tasks = [
+            asyncio.create_task(index_in_slot(position, server, previous))
+            for position, (server, previous) in enumerate(pending)
+        ]
+        finished = {}
+        next_position = 0
+        try:
+            with (
+                self._open_checkpoint() as checkpoint,
+                tqdm(total=len(tasks)) as progress,
+            ):
+                for next_done in asyncio.as_completed(tasks):
+                    position, server_output = await next_done
+                    progress.update()
+                    finished[position] = server_output
+                    while next_position in finished:
+                        server_output = finished.pop(next_position)
+                        next_position += 1
+                        if server_output is None:
+                            # a failed re-index keeps the previous entry
+                            continue
+                        name = server_output["server_name"]
+                        if name in positions:
+                            all_servers_info[positions[name]] = server_output
+                        else:
+                            positions[name] = len(all_servers_info)
+                            all_servers_info.append(server_output)
+                        try:
+                            checkpoint.write(
+                                json.dumps(server_output, ensure_ascii=False) + "\n"
+                            )
+                            checkpoint.flush()
+                            new_servers_processed_count += 1
+                            compact = True
+                        except IOError as e:
+                            logger.error(
+                                f"Error writing to checkpoint {self.checkpoint_file}: {e}"
+                            )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if compact:
             try:
-                server_summary = await self._generate_summary(
-                    server_name, server_description, tools
-                )
-                embedding_tasks = {
-                    "server_desc": self._get_embedding(server_description),
-                    "server_summary": self._get_embedding(server_summary),
-                }
-                for i, tool in enumerate(tools):
-                    embedding_tasks[f"tool_{i}"] = self._get_embedding(tool.description)
-
-                embeddings_results = await asyncio.gather(*embedding_tasks.values())
-                embeddings = dict(zip(embedding_tasks.keys(), embeddings_results))
-
-                formatted_tools = []
-                for i, tool in enumerate(tools):
-                    formatted_tools.append(
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "description_embedding": embeddings.get(f"tool_{i}", []),
-                            "parameter": self._format_tool_parameters(tool),
-                        }
-                    )
-
-                server_output = {
-                    "server_name": server_name,
-                    "server_summary": server_summary,
-                    "server_description": server_description,
-                    "description_embedding": embeddings.get("server_desc", []),
-                    "summary_embedding": embeddings.get("server_summary", []),
-                    "tools": formatted_tools,
-                }
-
-                all_servers_info.append(server_output)
-
-                try:
-                    self.output_file.parent.mkdir(parents=True, exist_ok=True)
-                    with open(self.output_file, "w", encoding="utf-8") as f:
-                        json.dump(all_servers_info, f, indent=2, ensure_ascii=False)
-                    new_servers_processed_count += 1
-                except IOError as e:
-                    logger.error(
-                        f"Error writing to output file {self.output_file}: {e}"
-                    )
-
-            except Exception as e:
-                logger.error(f"Error processing server '{server_name}': {e}")
-                continue
+                self._save_servers_info(all_servers_info)
+                self.checkpoint_file.unlink(missing_ok=True)
+            except IOError as e:
+                logger.error(f"Error writing to output file {self.output_file}: {e}")
+        else:
+            # nothing readable was logged
+            self.checkpoint_file.unlink(missing_ok=True)
+        if self.output_file.exists() and not index_is_current(self.output_file):
+            self._write_index(all_servers_info)
         logger.info("Indexing completed.")
         if new_servers_processed_count > 0:
             logger.info(
-                f"Add {new_servers_processed_count} new servers to {self.output_file}."
+                f"Indexed {new_servers_processed_count} new or changed servers "
+                f"into {self.output_file}."
             )
         else:
-            logger.info("No new servers were added.")
+            logger.info("No servers were added or changed.")
+        stats = self.embedding_stats()
+        if stats["store_hits"] or stats["store_misses"]:
+            logger.info(
+                f"Embeddings: {stats['store_hits']} from the store "
+                f"({stats['hit_rate']:.0%}), {stats['embedded']} embedded in "
+                f"{stats['requests']} requests, {stats['deduplicated']} duplicates."
+            )
+        for name, limiter in rate_limit_stats().items():
+            if limiter["throttled"] or limiter["retries"]:
+                logger.info(
+                    f"Rate limiter {name}: {limiter['throttled']} throttled, "
+                    f"{limiter['retries']} retries, {limiter['failures']} failed, "
+                    f"{limiter['wait_seconds']}s waited, "
+                    f"concurrency limit {limiter['concurrency_limit']}."
+                )
 
 
-async def run_generation():
+async def run_generation(wait: bool = True):
     try:
         generator = McpArgGenerator(
             config=DEFAULT_CONFIG_PATH, output_file=DEFAULT_OUTPUT_PATH
         )
-        await generator.generate()
+        await generator.generate(wait=wait)
     except (FileNotFoundError, ValueError, TypeError) as e:
         logger.error(f"Error initializing McpArgGenerator: {e}")
 
 
 if __name__ == "__main__":
-    asyncio.run(run_generation())
+    parser = argparse.ArgumentParser(description="Build the MCP tool index.")
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="exit at once if another run is already indexing the output",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_generation(wait=not args.no_wait))
@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import psutil
+
+from mcp_copilot.embedding_cache import EmbeddingCache
+from mcp_copilot.embedding_stub import start_stub_server, stub_embedding
+from mcp_copilot.index import CatalogIndex, index_paths, normalize_rows
+from mcp_copilot.router import Router
+
+DEFAULT_TOOLS_PATH = Path("./tools/LiveMCPTool/tools.json")
+SYNTHETIC_SIZES = (1_000, 10_000, 100_000)
+TOOLS_PER_SERVER = 10
+SYNTHETIC_CATEGORIES = ("Discovery", "Code", "File Access", "Finance", "Location")
+VOCABULARY = (
+    "search fetch read write list create delete update query page file repo "
+    "issue stock price weather map route image chart video music email event "
+    "calendar user comment story news database table schema git branch commit "
+    "translate summarize convert upload download browser screenshot pdf "
+    "spreadsheet ticket payment invoice location address time zone forecast"
+).split()
+
+
+def latency_stats(samples: list[float], wall: float | None = None) -> dict[str, Any]:
+    """Summary of per-call latencies in seconds, reported in milliseconds.
+
+    ``qps`` is calls per second of ``wall`` time when the calls overlapped,
+    and of summed latency otherwise.
+    """
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000
+    elapsed = wall if wall is not None else float(np.sum(samples))
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "qps": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def rss_mb() -> float:
+    return round(psutil.Process().memory_info().rss / 2**20, 1)
+
+
+def live_catalog(tools_path: str | Path, dimensions: int) -> list[dict[str, Any]]:
+    """The LiveMCPTool catalog in ``mcp_arg_*.json`` form, embedded by the stub.
+
+    The server description doubles as its summary, so no LLM is needed.
+    """
+    with open(tools_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    catalog = []
+    for entry in entries:
+        server_name = list(entry["config"]["mcpServers"].keys())[0]
+        tools = entry["tools"].get(server_name, {}).get("tools", [])
+        description = entry.get("description") or ""
+        catalog.append(
+            {
+                "server_name": server_name,
+                "server_summary": description,
+                "server_description": description,
+                "category": entry.get("category"),
+                "description_embedding": stub_embedding(
+                    description, dimensions
+                ).tolist(),
+                "summary_embedding": stub_embedding(description, dimensions).tolist(),
+                "tools": [
+                    {
+                        "name": tool["name"],
+                        "description": tool.get("description") or "",
+                        "description_embedding": stub_embedding(
+                            tool.get("description") or "", dimensions
+                        ).tolist(),
+                        "parameter": {},
+                    }
+                    for tool in tools
+                ],
+            }
+        )
+    return catalog
+
+
+def synthetic_index(num_tools: int, dimensions: int, seed: int = 0) -> CatalogIndex:
+    """A random catalog of ``num_tools`` tools, ``TOOLS_PER_SERVER`` per server."""
+    rng = np.random.default_rng(seed)
+    n_servers = -(-num_tools // TOOLS_PER_SERVER)
+    servers, tool_refs = [], []
+    for i in range(n_servers):
+        count = min(TOOLS_PER_SERVER, num_tools - i * TOOLS_PER_SERVER)
+        description = " ".join(rng.choice(VOCABULARY, 12))
+        servers.append(
+            {
+                "server_name": f"synthetic-{i}",
+                "server_summary": description,
+                "server_description": description,
+                "category": SYNTHETIC_CATEGORIES[i % len(SYNTHETIC_CATEGORIES)],
+                "tools": [
+                    {
+                        "name": f"tool_{i}_{j}",
+                        "description": " ".join(rng.choice(VOCABULARY, 8)),
+                        "parameter": {"query": "(string) query"},
+                    }
+                    for j in range(count)
+                ],
+            }
+        )
+        tool_refs.extend((i, j) for j in range(count))
+    vectors = rng.standard_normal((2 * n_servers + num_tools, dimensions))
+    vectors = normalize_rows(vectors.astype(np.float32))
+    tool_server = np.asarray([i for i, _ in tool_refs], dtype=np.int32)
+    return CatalogIndex(
+        servers=servers,
+        tools=[servers[i]["tools"][j] for i, j in tool_refs],
+        server_vectors=vectors[: 2 * n_servers],
+        server_mask=np.ones(n_servers, dtype=bool),
+        tool_matrix=vectors[2 * n_servers :],
+        tool_server=tool_server,
+        tool_offsets=np.searchsorted(
+            tool_server, np.arange(n_servers + 1), side="left"
+        ).astype(np.int64),
+        tool_refs=tool_refs,
+    )
+
+
+def catalog_queries(index: CatalogIndex, count: int, seed: int = 0) -> list[str]:
+    """Route queries replayed from tool descriptions sampled from the catalog."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(index.num_tools, size=min(count, index.num_tools), replace=False)
+    queries = []
+    for row in rows:
+        server = index.servers[index.tool_server[row]]
+        queries.append(
+            "<tool_assistant>\n"
+            f"server: {' '.join(server['server_description'].split()[:12])}\n"
+            f"tool: {index.tools[row]['description']}\n"
+            "</tool_assistant>"
+        )
+    return queries
+
+
+@contextmanager
+def _environ(**values: str) -> Iterator[None]:
+    saved = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+async def bench_catalog(
+    name: str,
+    data_path: Path,
+    queries: list[str],
+    stub_url: str,
+    dimensions: int,
+    repeat: int = 3,
+    concurrency: int = 8,
+) -> dict[str, Any]:
+    """Time every routing stage against one catalog.
+
+    The router is configured from the environment as in production, except
+    that embeddings come from the stub and the route cache is disabled. The
+    embedding cache is emptied before each stage, so every stage pays for
+    its embedding requests.
+    """
+    rss = {"before_mb": rss_mb()}
+    env = {
+        "EMBEDDING_MODEL": "stub",
+        "EMBEDDING_DIMENSIONS": str(dimensions),
+        "EMBEDDING_API_KEY": "stub",
+        "EMBEDDING_BASE_URL": stub_url,
+        "EMBEDDING_CACHE_PATH": "",
+        "MCP_DATA_PATH": str(data_path),
+        "ROUTE_CACHE_SIZE": "0",
+    }
+    with _environ(**env):
+        start = time.perf_counter()
+        router = Router({"mcpServers": {}})
+        init = time.perf_counter() - start
+    matcher = router.matcher
+    rss["after_load_mb"] = rss_mb()
+    stages = {"router_init": latency_stats([init])}
+
+    try:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matcher.load_data(str(data_path))
+            samples.append(time.perf_counter() - start)
+        stages["load_data"] = latency_stats(samples)
+
+        parsed = [matcher.extract_tool_assistant(query) for query in queries]
+        matcher.embedding_cache = EmbeddingCache()
+        samples, server_lists = [], []
+        for server_desc, _ in parsed:
+            start = time.perf_counter()
+            server_lists.append(matcher.match_servers(server_desc))
+            samples.append(time.perf_counter() - start)
+        stages["match_servers"] = latency_stats(samples)
+
+        matcher.embedding_cache = EmbeddingCache()
+        samples = []
+        for (_, tool_desc), server_list in zip(parsed, server_lists):
+            start = time.perf_counter()
+            matcher.match_tools(server_list, tool_desc)
+            samples.append(time.perf_counter() - start)
+        stages["match_tools"] = latency_stats(samples)
+
+        matcher.embedding_cache = EmbeddingCache()
+        semaphore = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async def timed_route(query: str) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await router.route(query)
+                samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(timed_route(query) for query in queries))
+        stages["route"] = latency_stats(samples, wall=time.perf_counter() - start)
+        rss["after_route_mb"] = rss_mb()
+    finally:
+        await router.aclose()
+
+    return {
+        "name": name,
+        "servers": len(matcher.index),
+        "tools": matcher.index.num_tools,
+        "dimensions": matcher.index.dimensions,
+        "rss": rss,
+        "stages": stages,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(
+    tools_path: str | Path | None = DEFAULT_TOOLS_PATH,
+    sizes: tuple[int, ...] = SYNTHETIC_SIZES,
+    dimensions: int = 256,
+    num_queries: int = 200,
+    repeat: int = 3,
+    concurrency: int = 8,
+    latency: float = 0.0,
+    workdir: str | Path | None = None,
+) -> dict[str, Any]:
+    """Benchmark the live catalog (if ``tools_path`` exists) and synthetic ones."""
+    stub = start_stub_server(dimensions=dimensions, latency=latency)
+    catalogs = []
+    try:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            tmp = Path(tmp)
+            if tools_path and Path(tools_path).exists():
+                data_path = tmp / "live.json"
+                with open(data_path, "w", encoding="utf-8") as f:
+                    json.dump(live_catalog(tools_path, dimensions), f)
+                index = CatalogIndex.from_path(data_path)
+                catalogs.append(
+                    await bench_catalog(
+                        "live",
+                        data_path,
+                        catalog_queries(index, num_queries),
+                        stub.base_url,
+                        dimensions,
+                        repeat,
+                        concurrency,
+                    )
+                )
+            for size in sizes:
+                index = synthetic_index(size, dimensions)
+                data_path = tmp / f"synthetic-{size}.json"
+                index.save(data_path)
+                queries = catalog_queries(index, num_queries)
+                del index
+                catalogs.append(
+                    await bench_catalog(
+                        f"synthetic-{size}",
+                        index_paths(data_path)[1],
+                        queries,
+                        stub.base_url,
+                        dimensions,
+                        repeat,
+                        concurrency,
+                    )
+                )
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    return {
+        "environment": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "dimensions": dimensions,
+            "queries": num_queries,
+            "repeat": repeat,
+            "concurrency": concurrency,
+            "stub_latency_ms": latency * 1000,
+            "embedding_requests": stub.requests,
+            "embedded_texts": stub.inputs,
+        },
+        "catalogs": catalogs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Measure routing latency, throughput and memory against a local "
+            "embedding stub."
+        )
+    )
+    parser.add_argument("--tools-json", default=str(DEFAULT_TOOLS_PATH))
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SYNTHETIC_SIZES),
+        help="comma-separated synthetic catalog sizes in tools, empty for none",
+    )
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_benchmark(
+            tools_path=args.tools_json,
+            sizes=tuple(int(size) for size in args.sizes.split(",") if size),
+            dimensions=args.dimensions,
+            num_queries=args.queries,
+            repeat=args.repeat,
+            concurrency=args.concurrency,
+            latency=args.latency_ms / 1000,
+            workdir=args.workdir,
+        )
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    for catalog in report["catalogs"]:
+        summary = ", ".join(
+            f"{stage} p50 {stats['p50_ms']:.2f}ms"
+            for stage, stats in catalog["stages"].items()
+        )
+        print(f"{catalog['name']} ({catalog['tools']} tools): {summary}")
+    print(f"Wrote {args.output}")
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import anyio
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from mcp_copilot.mcp_connection import MCPConnection
+from mcp_copilot.metrics import stage_metrics
+from mcp_copilot.schemas import Server
+
+logger = logging.getLogger(__name__)
+
+# the request never left: sending on a transport that is already closed
+UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether ``error`` means the connection itself is dead."""
+    return isinstance(error, (*UNSENT_ERRORS, anyio.EndOfStream)) or (
+        isinstance(error, McpError) and error.error.code == CONNECTION_CLOSED
+    )
+
+
+class _PooledConnection:
+    """An ``MCPConnection`` owned by a runner task.
+
+    The transports use anyio cancel scopes, which have to be entered and
+    exited by the same task, so the connection is opened and closed inside
+    ``run`` and only lent out in between.
+    """
+
+    def __init__(self, server: Server):
+        self.connection = MCPConnection(server)
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.stop = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.in_use = 0
+        self.last_used = self.last_checked = time.monotonic()
+        self.broken = False
+        self.waiting_for_slot = True
+
+    async def run(self, slots: asyncio.Semaphore) -> None:
+        try:
+            # the slot is held until the server process has exited
+            async with slots:
+                self.waiting_for_slot = False
+                async with self.connection:
+                    self.ready.set_result(None)
+                    await self.stop.wait()
+        except asyncio.CancelledError:
+            self.ready.cancel()
+            raise
+        except Exception as e:
+            if not self.ready.done():
+                self.ready.set_exception(e)
+            else:
+                logger.warning(
+                    f"Connection to {self.connection.server.name} failed: {e}"
+                )
+
+
+class ConnectionPool:
+    """Keeps live MCP server connections for reuse across tool calls.
+
+    At most ``max_size`` connections, one per server, are open at once, which
+    caps the number of spawned server processes. Opening another closes the
+    least recently used idle one; when every connection is busy the least
+    recently used one is drained instead: it takes no new calls, and calls
+    to its server open a new connection that queues, in FIFO order, behind
+    the opens already waiting for a slot. Connections idle for
+    ``idle_ttl`` seconds are closed, and one idle for longer than
+    ``health_check_interval`` is pinged before it is lent out, replaced if
+    the ping fails. A connection that fails during a call, or whose call
+    times out or is cancelled, is dropped; the call is retried on a new connection only when the request was never
+    sent, since tools may have side effects.
+    """
+
+    def __init__(
+        self,
+        servers: dict[str, Server],
+        max_size: int = 16,
+        idle_ttl: float = 300.0,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+    ):
+        self.servers = servers
+        self.max_size = max(1, max_size)
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self._entries: OrderedDict[str, _PooledConnection] = OrderedDict()
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._closing: set[asyncio.Task] = set()
+        self._reaper: asyncio.Task | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.health_check_failures = 0
+        self.reconnects = 0
+
+    @asynccontextmanager
+    async def connection(self, server_name: str) -> AsyncIterator[MCPConnection]:
+        """Lend the connection to ``server_name``, opening it if needed."""
+        entry = await self._checkout(server_name)
+        try:
+            yield entry.connection
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # the abandoned request may still be running in the server, so
+            # the process is closed once its other calls finish, as without
+            # the pool
+            entry.broken = True
+            raise
+        except Exception as e:
+            if is_connection_error(e):
+                entry.broken = True
+            raise
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.broken:
+                self._discard(server_name, entry)
+            elif not entry.in_use and self._waiting_for_slot():
+                # hand the slot to a server that is waiting to be opened
+                self.evictions += 1
+                self._discard(server_name, entry)
+
+    async def call_tool(
+        self, server_name: str, tool_name: str, params: dict[str, Any]
+    ) -> Any:
+        try:
+            async with self.connection(server_name) as connection:
+                return await connection.call_tool(tool_name, params)
+        except UNSENT_ERRORS as e:
+            logger.info(f"Reconnecting to {server_name} after {type(e).__name__}")
+            self.reconnects += 1
+            async with self.connection(server_name) as connection:
+                return await connection.call_tool(tool_name, params)
+
+    async def _checkout(self, server_name: str) -> _PooledConnection:
+        if self._reaper is None and self.idle_ttl > 0:
+            self._reaper = asyncio.create_task(self._expire_idle())
+        while True:
+            entry = self._entries.get(server_name)
+            if entry is None or entry.broken:
+                entry = self._open(server_name)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(server_name)
+            entry.in_use += 1
+            try:
+                await asyncio.shield(entry.ready)
+            except BaseException:
+                entry.in_use -= 1
+                if entry.ready.done():
+                    # the connection could not be opened
+                    self._discard(server_name, entry)
+                raise
+            try:
+                healthy = await self._healthy(entry)
+            except BaseException:
+                entry.in_use -= 1
+                raise
+            if healthy:
+                return entry
+            entry.in_use -= 1
+            self._discard(server_name, entry)
+
+    def _open(self, server_name: str) -> _PooledConnection:
+        server = self.servers.get(server_name)
+        if server is None:
+            raise ValueError(
+                f"Server '{server_name}' is not defined in the configuration."
+            )
+        self.misses += 1
+        while len(self._entries) >= self.max_size:
+            # the least recently used idle connection, else the least recently
+            # used busy one: it drains, new calls to its server queue behind
+            # this open, and its slot is freed once its in-flight calls finish
+            victim = next(
+                (name for name, e in self._entries.items() if not e.in_use),
+                next(
+                    (
+                        name
+                        for name, e in self._entries.items()
+                        if not e.waiting_for_slot
+                    ),
+                    None,
+                ),
+            )
+            if victim is None:
+                # every pooled connection is itself waiting for a slot
+                break
+            self.evictions += 1
+            self._discard(victim, self._entries[victim])
+        entry = _PooledConnection(server)
+        entry.task = asyncio.create_task(entry.run(self._slots))
+        self._entries[server_name] = entry
+        return entry
+
+    def _waiting_for_slot(self) -> bool:
+        return any(entry.waiting_for_slot for entry in self._entries.values())
+
+    async def _healthy(self, entry: _PooledConnection) -> bool:
+        if entry.task.done():
+            return False
+        now = time.monotonic()
+        if entry.in_use > 1 or now - entry.last_checked < self.health_check_interval:
+            return True
+        entry.last_checked = now
+        try:
+            await asyncio.wait_for(entry.connection.ping(), self.ping_timeout)
+            return True
+        except Exception as e:
+            self.health_check_failures += 1
+            logger.info(
+                f"Health check of {entry.connection.server.name} failed, "
+                f"reconnecting: {e!r}"
+            )
+            return False
+
+    def _discard(self, server_name: str, entry: _PooledConnection) -> None:
+        """Drop ``entry`` from the pool; it is closed once no call uses it."""
+        entry.broken = True
+        if self._entries.get(server_name) is entry:
+            del self._entries[server_name]
+        if entry.in_use == 0 and not entry.stop.is_set():
+            entry.stop.set()
+            task = asyncio.create_task(self._close(entry))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(entry: _PooledConnection) -> None:
+        entry.stop.set()
+        if entry.task is not None:
+            if entry.waiting_for_slot:
+                entry.task.cancel()
+            try:
+                await entry.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _expire_idle(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_ttl / 4))
+            now = time.monotonic()
+            for name, entry in list(self._entries.items()):
+                if not entry.in_use and now - entry.last_used >= self.idle_ttl:
+                    self.expirations += 1
+                    self._discard(name, entry)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "in_use": sum(1 for e in self._entries.values() if e.in_use),
+            "waiting_for_slot": sum(
+                1 for e in self._entries.values() if e.waiting_for_slot
+            ),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "health_check_failures": self.health_check_failures,
+            "reconnects": self.reconnects,
+        }
+
+    async def aclose(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        entries = list(self._entries.values())
+        self._entries.clear()
+        with stage_metrics.time("connection.pool_close"):
+            for entry in entries:
+                entry.in_use = 0
+                entry.broken = True
+                await self._close(entry)
+            if self._closing:
+                await asyncio.gather(*self._closing, return_exceptions=True)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for batch budgeting."""
+    return len(text) // 4 + 1
+
+
+class EmbeddingBatcher:
+    """Coalesces single-text embedding calls from concurrent tasks into batches.
+
+    Callers ``await embed(text)``; texts are queued and sent together through
+    ``create(texts)`` once ``max_batch_size`` texts or ``max_batch_tokens``
+    estimated tokens are pending, or ``max_delay`` seconds after the first one
+    was queued. Identical texts in the queue share one slot. At most
+    ``max_in_flight`` batches are sent at the same time. If ``create`` raises,
+    every caller of that batch gets the exception.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[list[str]], Awaitable[list[list[float]]]],
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 100_000,
+        max_delay: float = 0.02,
+        max_in_flight: int = 4,
+    ):
+        self.create = create
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_delay = max_delay
+        self.max_in_flight = max(1, max_in_flight)
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._pending_tokens = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.requests = 0
+        self.texts = 0
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        tokens = estimate_tokens(text)
+        if text not in self._pending and (
+            len(self._pending) >= self.max_batch_size
+            or (self._pending and self._pending_tokens + tokens > self.max_batch_tokens)
+        ):
+            self._flush()
+        future = loop.create_future()
+        if text not in self._pending:
+            self._pending[text] = []
+            self._pending_tokens += tokens
+        self._pending[text].append(future)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_tokens = self._pending, {}, 0
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        texts = list(batch)
+        async with self._semaphore:
+            self.requests += 1
+            self.texts += len(texts)
+            try:
+                vectors = await self.create(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(
+                        f"Got {len(vectors)} embeddings for {len(texts)} texts"
+                    )
+            except Exception as e:
+                for futures in batch.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                return
+        for text, vector in zip(texts, vectors):
+            for future in batch[text]:
+                if not future.done():
+                    future.set_result(vector)
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from cachetools import LRUCache, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so trivially different queries share a key."""
+    return " ".join(text.split())
+
+
+def embedding_key(model: str, dimensions: int | None, text: str) -> str:
+    """Content address of an embedding: model, dimensions and normalized text."""
+    raw = f"{model}\0{dimensions or 0}\0{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Persistent embedding table in a SQLite file, keyed by ``embedding_key``."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent without a sync per commit; a crash can at most
+        # lose the last few cached vectors
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, dimensions INTEGER, "
+            "vector BLOB, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, max_age: float | None = None) -> np.ndarray | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        vector, created_at = row
+        if max_age is not None and time.time() - created_at > max_age:
+            return None
+        return np.frombuffer(vector, dtype=np.float32)
+
+    def put(self, key: str, model: str, dimensions: int | None, vector: Any) -> None:
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                (key, model, dimensions or 0, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def put_many(self, rows: list[tuple[str, str, int | None, Any]]) -> None:
+        """Store ``(key, model, dimensions, vector)`` rows in one transaction."""
+        now = time.time()
+        values = [
+            (key, model, dimensions or 0, np.asarray(vector, np.float32).tobytes(), now)
+            for key, model, dimensions, vector in rows
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", values
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings with optional TTL and SQLite backing.
+
+    Entries live in memory as float32 arrays. When ``store_path`` is given, every
+    new embedding is also written to an ``EmbeddingStore`` so warm entries
+    survive a restart; a memory miss falls back to the store before counting
+    as a miss.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float | None = None,
+        store_path: str | Path | None = None,
+    ):
+        self.ttl = ttl or None
+        if self.ttl:
+            self._memory = TTLCache(maxsize=maxsize, ttl=self.ttl)
+        else:
+            self._memory = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.store = EmbeddingStore(store_path) if store_path else None
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, model: str, dimensions: int | None, text: str) -> list[float] | None:
+        key = embedding_key(model, dimensions, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self.hits += 1
+                return vector.tolist()
+        if self.store is not None:
+            vector = self.store.get(key, max_age=self.ttl)
+            if vector is not None:
+                with self._lock:
+                    self._memory[key] = vector
+                    self.store_hits += 1
+                return vector.tolist()
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(
+        self, model: str, dimensions: int | None, text: str, embedding: list[float]
+    ) -> None:
+        self.put_many(model, dimensions, [(text, embedding)])
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: int | None,
+        items: list[tuple[str, list[float]]],
+    ) -> None:
+        """Cache ``(text, embedding)`` pairs, persisted in one transaction."""
+        self._persist(self._remember(model, dimensions, items))
+
+    async def aput_many(
+        self,
+        model: str,
+        dimensions: int | None,
+        items: list[tuple[str, list[float]]],
+    ) -> None:
+        """``put_many`` that writes the store from a worker thread."""
+        rows = self._remember(model, dimensions, items)
+        if self.store is not None and rows:
+            await asyncio.to_thread(self._persist, rows)
+
+    def _remember(
+        self,
+        model: str,
+        dimensions: int | None,
+        items: list[tuple[str, list[float]]],
+    ) -> list[tuple[str, str, int | None, np.ndarray]]:
+        rows = [
+            (
+                embedding_key(model, dimensions, text),
+                model,
+                dimensions,
+                np.asarray(embedding, dtype=np.float32),
+            )
+            for text, embedding in items
+        ]
+        with self._lock:
+            for key, _, _, vector in rows:
+                self._memory[key] = vector
+        return rows
+
+    def _persist(self, rows: list[tuple[str, str, int | None, np.ndarray]]) -> None:
+        if self.store is None or not rows:
+            return
+        try:
+            self.store.put_many(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist embeddings to {self.store.path}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "size": len(self._memory),
+                "maxsize": self._memory.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
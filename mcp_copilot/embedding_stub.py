@@ -0,0 +1,140 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import numpy as np
+
+from mcp_copilot.lexical import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def stub_embedding(text: str, dimensions: int) -> np.ndarray:
+    """Deterministic unit vector for ``text``.
+
+    The vector is the normalized sum of one pseudo-random vector per token, so
+    texts sharing words get a positive cosine similarity and routing results
+    stay meaningful enough to exercise every code path.
+    """
+    tokens = tokenize(text) or [text]
+    vector = np.sum([_token_vector(token, dimensions) for token in tokens], axis=0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class EmbeddingStubServer(ThreadingHTTPServer):
+    """OpenAI-compatible ``/v1/embeddings`` endpoint backed by ``stub_embedding``.
+
+    ``latency`` seconds are added to every request to imitate a remote
+    provider. Request and input counts are kept for the benchmark report.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        dimensions: int = 1024,
+        latency: float = 0.0,
+    ):
+        super().__init__(address, _EmbeddingHandler)
+        self.dimensions = dimensions
+        self.latency = latency
+        self.requests = 0
+        self.inputs = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def embed(self, payload: dict[str, Any]) -> dict[str, Any]:
+        texts = payload.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        dimensions = int(payload.get("dimensions") or self.dimensions)
+        with self._lock:
+            self.requests += 1
+            self.inputs += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = stub_embedding(str(text), dimensions)
+            if payload.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(tokenize(str(text))) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model") or "stub",
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    server: EmbeddingStubServer
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") not in ("/v1/embeddings", "/embeddings"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            self._send(200, self.server.embed(payload))
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": {"message": str(e)}})
+
+    def _send(self, status: int, body: dict[str, Any]) -> None:
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def start_stub_server(
+    dimensions: int = 1024, latency: float = 0.0, port: int = 0
+) -> EmbeddingStubServer:
+    """Start a stub server on a background thread; stop it with ``shutdown()``."""
+    server = EmbeddingStubServer(("127.0.0.1", port), dimensions, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve deterministic embeddings on an OpenAI-compatible API."
+    )
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = EmbeddingStubServer(
+        ("127.0.0.1", args.port), args.dimensions, args.latency_ms / 1000
+    )
+    print(f"Embedding stub listening on {stub.base_url}")
+    stub.serve_forever()
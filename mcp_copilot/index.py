@@ -0,0 +1,629 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+import numpy as np
+
+from mcp_copilot.lexical import BM25Index, server_document, tool_document
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_KEYS = ("description_embedding", "summary_embedding")
+INDEX_VERSION = 1
+
+# read once at import: os.umask can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def index_paths(
+    data_path: str | Path, dimensions: int | None = None
+) -> tuple[Path, Path]:
+    """Vector block and metadata sidecar paths for a ``mcp_arg_*.json`` catalog.
+
+    A reduced-dimension copy of the index (see ``CatalogIndex.truncated``) is
+    stored beside the full one with a ``.d<dimensions>`` suffix.
+    """
+    path = Path(data_path)
+    if path.name.endswith(".meta.json"):
+        stem = path.name[: -len(".meta.json")]
+    else:
+        stem = path.stem
+    if dimensions:
+        stem = f"{stem}.d{dimensions}"
+    return path.parent / f"{stem}.vectors.npy", path.parent / f"{stem}.meta.json"
+
+
+@contextmanager
+def atomic_write(path: str | Path, mode: str = "wb", **kwargs) -> Iterator[IO]:
+    """Open a unique temporary file beside ``path`` and move it over ``path``
+    on success, so concurrent writers never fill or replace each other's file.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            # mkstemp creates the file private to its owner
+            os.chmod(f.fileno(), 0o666 & ~_UMASK)
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def source_signature(data_path: str | Path) -> dict[str, int]:
+    stat = os.stat(data_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def index_source(
+    data_path: str | Path, dimensions: int | None = None
+) -> dict[str, int]:
+    """The ``source`` recorded by an index built from ``data_path``."""
+    source = source_signature(data_path)
+    if dimensions:
+        source["dimensions"] = dimensions
+    return source
+
+
+def _read_current_meta(
+    data_path: str | Path, dimensions: int | None = None
+) -> dict[str, Any] | None:
+    """The sidecar metadata if it was built from the current ``data_path``."""
+    vectors_path, meta_path = index_paths(data_path, dimensions)
+    if not (meta_path.exists() and vectors_path.exists()):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (ValueError, OSError) as e:
+        logger.warning(f"Ignoring unreadable index {meta_path}: {e}")
+        return None
+    if meta.get("source") != index_source(data_path, dimensions):
+        return None
+    return meta
+
+
+def index_is_current(data_path: str | Path, dimensions: int | None = None) -> bool:
+    return _read_current_meta(data_path, dimensions) is not None
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize every row in place; all-zero rows are left as zeros."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def normalize_vector(vector: Any) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return vec
+    return vec / norm
+
+
+def normalize_category(name: Any) -> str:
+    """Case- and whitespace-insensitive key of a server category."""
+    return " ".join(str(name or "").split()).casefold()
+
+
+def split_categories(text: str | None) -> list[str]:
+    """Comma-separated category hint, e.g. ``"Discovery, Code"``."""
+    return [c for c in (normalize_category(c) for c in (text or "").split(",")) if c]
+
+
+def truncate_rows(matrix: np.ndarray, dimensions: int, chunk: int = 8192) -> np.ndarray:
+    """Keep the leading ``dimensions`` columns of every row and renormalize.
+
+    This is how Matryoshka-trained embeddings (e.g. OpenAI ``text-embedding-3``)
+    are shortened: the prefix of the vector is itself a usable embedding once
+    it is scaled back to unit norm. Rows are copied in chunks so a memory-mapped
+    matrix is never loaded whole.
+    """
+    out = np.empty((matrix.shape[0], dimensions), dtype=np.float32)
+    for start in range(0, matrix.shape[0], chunk):
+        out[start : start + chunk] = matrix[start : start + chunk, :dimensions]
+    return normalize_rows(out)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first.
+
+    Uses ``argpartition`` so only the selected slice is sorted. Ties are broken
+    by position, like a stable descending sort.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+class CatalogIndex:
+    """Dense matrices built from the ``mcp_arg_*.json`` server catalog.
+
+    Every embedding is stored as a contiguous float32 row with unit norm, so a
+    cosine similarity against a normalized query is a single dot product.
+    Missing or malformed embeddings become zero rows and score 0, the same
+    result ``ToolMatcher.cosine_similarity`` gives for a zero vector.
+    """
+
+    def __init__(
+        self,
+        servers: list[dict[str, Any]],
+        tools: list[dict[str, Any]],
+        server_vectors: np.ndarray,
+        server_mask: np.ndarray,
+        tool_matrix: np.ndarray,
+        tool_server: np.ndarray,
+        tool_offsets: np.ndarray,
+        tool_refs: list[tuple[int, int]] | None = None,
+        source: dict[str, int] | None = None,
+    ):
+        self.servers = servers
+        self.tools = tools
+        # description rows first, then summary rows, as one contiguous block
+        self.server_vectors = server_vectors
+        self.server_desc = server_vectors[: len(servers)]
+        self.server_summary = server_vectors[len(servers) :]
+        self.server_mask = server_mask
+        self.tool_matrix = tool_matrix
+        self.tool_server = tool_server
+        self.tool_offsets = tool_offsets
+        self.tool_refs = tool_refs
+        self.source = source
+        # the ``.d<dimensions>`` sidecar this was served from; None for the
+        # full-dimension one (see ``from_path``)
+        self.sidecar_dimensions: int | None = None
+        self.server_search = None
+        self.tool_search = None
+        # BM25 indexes, built by build_lexical_index or on first use
+        self._lexical: tuple[BM25Index, BM25Index] | None = None
+        self._lexical_lock = threading.Lock()
+        # optional reduced-precision copies for a fast first scoring pass; the
+        # float32 matrices above are still used to rescore the best candidates
+        self.server_quantized = None
+        self.tool_quantized = None
+        self._quantizer = None
+        self.dimensions = tool_matrix.shape[1]
+        self.num_searchable = int(server_mask.sum())
+        self.server_position = {
+            server.get("server_name"): i for i, server in enumerate(servers)
+        }
+        # servers of each category; shards are built from these on first use
+        category_members: dict[str, list[int]] = {}
+        for i, server in enumerate(servers):
+            key = normalize_category(server.get("category"))
+            if key:
+                category_members.setdefault(key, []).append(i)
+        self.category_servers = {
+            key: np.asarray(members, dtype=np.int64)
+            for key, members in category_members.items()
+        }
+        self._shards: dict[tuple[str, ...], CatalogIndex] = {}
+
+    def __len__(self) -> int:
+        return len(self.servers)
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the catalog version this index was built from."""
+        if self.source is None:
+            return f"memory-{id(self):x}"
+        raw = json.dumps(self.source, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def num_tools(self) -> int:
+        return len(self.tools)
+
+    @classmethod
+    def from_servers(cls, servers_data: list[dict[str, Any]]) -> "CatalogIndex":
+        """Build the index from the JSON catalog.
+
+        The returned server and tool dicts are copies without their embedding
+        lists, so the boxed floats can be garbage collected once the matrices
+        are built.
+        """
+        dimensions = _infer_dimensions(servers_data)
+
+        n_servers = len(servers_data)
+        server_vectors = np.zeros((2 * n_servers, dimensions), dtype=np.float32)
+        server_desc = server_vectors[:n_servers]
+        server_summary = server_vectors[n_servers:]
+        server_mask = np.zeros(n_servers, dtype=bool)
+
+        servers = []
+        tools = []
+        tool_refs = []
+        tool_rows = []
+        tool_server = []
+        tool_offsets = [0]
+        for i, server in enumerate(servers_data):
+            if "description_embedding" in server:
+                server_mask[i] = True
+                _fill_row(server_desc, i, server["description_embedding"], server)
+            if "summary_embedding" in server:
+                _fill_row(server_summary, i, server["summary_embedding"], server)
+
+            server_tools = []
+            for j, tool in enumerate(server.get("tools") or []):
+                tool_meta = {k: v for k, v in tool.items() if k not in EMBEDDING_KEYS}
+                server_tools.append(tool_meta)
+                if "description_embedding" not in tool:
+                    continue
+                tools.append(tool_meta)
+                tool_refs.append((i, j))
+                tool_rows.append(tool["description_embedding"])
+                tool_server.append(i)
+            tool_offsets.append(len(tools))
+
+            server_meta = {k: v for k, v in server.items() if k not in EMBEDDING_KEYS}
+            server_meta["tools"] = server_tools
+            servers.append(server_meta)
+
+        tool_matrix = np.zeros((len(tool_rows), dimensions), dtype=np.float32)
+        for row, embedding in enumerate(tool_rows):
+            _fill_row(tool_matrix, row, embedding, servers_data[tool_server[row]])
+
+        return cls(
+            servers=servers,
+            tools=tools,
+            server_vectors=normalize_rows(server_vectors),
+            server_mask=server_mask,
+            tool_matrix=normalize_rows(tool_matrix),
+            tool_server=np.asarray(tool_server, dtype=np.int32),
+            tool_offsets=np.asarray(tool_offsets, dtype=np.int64),
+            tool_refs=tool_refs,
+        )
+
+    def save(
+        self,
+        data_path: str | Path,
+        source: dict[str, int] | None = None,
+        dimensions: int | None = None,
+    ) -> None:
+        """Write the binary index next to ``data_path``.
+
+        Vectors go to ``<stem>.vectors.npy`` as one float32 block (server
+        descriptions, then server summaries, then tools) and everything else to
+        the ``<stem>.meta.json`` sidecar. ``source`` records the signature of
+        the JSON catalog the index was built from, so stale sidecars can be
+        detected. Both files are replaced atomically. ``dimensions`` selects
+        the reduced-dimension file names.
+        """
+        vectors_path, meta_path = index_paths(data_path, dimensions)
+        meta = {
+            "version": INDEX_VERSION,
+            "source": source,
+            "dimensions": self.dimensions,
+            "num_servers": len(self.servers),
+            "num_tools": self.num_tools,
+            "servers": self.servers,
+            "server_mask": self.server_mask.tolist(),
+            "tool_refs": self.tool_refs,
+        }
+        vectors = np.concatenate([self.server_vectors, self.tool_matrix])
+
+        with atomic_write(vectors_path) as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+        with atomic_write(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(
+        cls, data_path: str | Path, mmap: bool = True, dimensions: int | None = None
+    ) -> "CatalogIndex":
+        """Load a binary index written by ``save``.
+
+        With ``mmap`` the vector block is memory-mapped read-only, so startup
+        only parses the small sidecar and the vector pages are shared through
+        the page cache between processes serving the same index.
+        """
+        vectors_path, meta_path = index_paths(data_path, dimensions)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls._from_meta(vectors_path, meta_path, meta, mmap=mmap)
+        index.sidecar_dimensions = dimensions or None
+        return index
+
+    @classmethod
+    def _from_meta(
+        cls,
+        vectors_path: Path,
+        meta_path: Path,
+        meta: dict[str, Any],
+        mmap: bool = True,
+    ) -> "CatalogIndex":
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"Unsupported index version {meta.get('version')} in {meta_path}"
+            )
+        vectors = np.load(vectors_path, mmap_mode="r" if mmap else None)
+        n_servers = meta["num_servers"]
+        n_tools = meta["num_tools"]
+        if vectors.shape != (2 * n_servers + n_tools, meta["dimensions"]):
+            raise ValueError(f"{vectors_path} does not match {meta_path}")
+
+        servers = meta["servers"]
+        tool_refs = [tuple(ref) for ref in meta["tool_refs"]]
+        tool_server = np.asarray([i for i, _ in tool_refs], dtype=np.int32)
+        return cls(
+            servers=servers,
+            tools=[servers[i]["tools"][j] for i, j in tool_refs],
+            server_vectors=vectors[: 2 * n_servers],
+            server_mask=np.asarray(meta["server_mask"], dtype=bool),
+            tool_matrix=vectors[2 * n_servers :],
+            tool_server=tool_server,
+            tool_offsets=np.searchsorted(
+                tool_server, np.arange(n_servers + 1), side="left"
+            ).astype(np.int64),
+            tool_refs=tool_refs,
+            source=meta.get("source"),
+        )
+
+    @classmethod
+    def from_path(
+        cls, data_path: str | Path, dimensions: int | None = None
+    ) -> "CatalogIndex":
+        """Load the catalog, preferring an up-to-date binary index.
+
+        ``data_path`` may be the JSON catalog or a ``.meta.json`` sidecar. For a
+        JSON catalog the sidecar is used when its recorded source signature
+        matches the file; otherwise the JSON is parsed and the binary index is
+        (re)written so the next start is fast.
+
+        With ``dimensions``, the index is served at that reduced dimension: the
+        full vectors are truncated and renormalized once and the result is
+        kept in its own sidecar. A catalog embedded at exactly ``dimensions``
+        is served from the full sidecar instead; ``sidecar_dimensions`` of the
+        result tells which one was used. Asking for more dimensions than the
+        catalog was embedded with is an error.
+        """
+        path = Path(data_path)
+        if path.name.endswith(".meta.json"):
+            index = cls.load(path)
+            if dimensions and dimensions != index.dimensions:
+                raise ValueError(
+                    f"Index {path} has dimension {index.dimensions}, "
+                    f"expected {dimensions}"
+                )
+            return index
+
+        if dimensions:
+            meta = _read_current_meta(path, dimensions)
+            if meta is not None:
+                index = cls._from_meta(*index_paths(path, dimensions), meta)
+                index.sidecar_dimensions = dimensions
+                return index
+            full = cls.from_path(path)
+            if full.dimensions == dimensions:
+                return full
+            reduced = full.truncated(dimensions)
+            reduced.source = index_source(path, dimensions)
+            reduced.sidecar_dimensions = dimensions
+            try:
+                reduced.save(path, source=reduced.source, dimensions=dimensions)
+            except OSError as e:
+                logger.warning(f"Could not write reduced index for {path}: {e}")
+            return reduced
+
+        meta = _read_current_meta(path)
+        if meta is not None:
+            return cls._from_meta(*index_paths(path), meta)
+
+        signature = source_signature(path)
+        with open(path, "r", encoding="utf-8") as f:
+            index = cls.from_servers(json.load(f))
+        index.source = signature
+        try:
+            index.save(path, source=signature)
+        except OSError as e:
+            logger.warning(f"Could not write binary index for {path}: {e}")
+        return index
+
+    def truncated(self, dimensions: int) -> "CatalogIndex":
+        """A copy of this index with every vector cut to ``dimensions``."""
+        if not 0 < dimensions <= self.dimensions:
+            raise ValueError(
+                f"Cannot reduce an index of dimension {self.dimensions} "
+                f"to {dimensions}"
+            )
+        return CatalogIndex(
+            servers=self.servers,
+            tools=self.tools,
+            server_vectors=truncate_rows(self.server_vectors, dimensions),
+            server_mask=self.server_mask,
+            tool_matrix=truncate_rows(self.tool_matrix, dimensions),
+            tool_server=self.tool_server,
+            tool_offsets=self.tool_offsets,
+            tool_refs=self.tool_refs,
+            source=self.source,
+        )
+
+    def check_query(self, query: np.ndarray) -> None:
+        if query.shape != (self.dimensions,):
+            raise ValueError(
+                f"Query embedding has dimension {query.shape[-1]}, "
+                f"index was built with {self.dimensions}"
+            )
+
+    @property
+    def quantized(self) -> bool:
+        return self.tool_quantized is not None
+
+    def quantize(self, quantizer: Any) -> None:
+        """Attach quantized copies made by ``quantizer(matrix)``."""
+        self._quantizer = quantizer
+        self.server_quantized = quantizer(self.server_vectors)
+        self.tool_quantized = quantizer(self.tool_matrix)
+
+    @property
+    def categories(self) -> list[str]:
+        return sorted(self.category_servers)
+
+    def shard(self, categories: list[str]) -> "CatalogIndex | None":
+        """Sub-index holding only the servers of the given categories.
+
+        Shards are built on first use and cached, with the same quantized
+        structures as this index (BM25 indexes are built when first needed).
+        Rows are copied out of the vector block, so only the pages of a
+        memory-mapped index that a shard needs are ever read. A shard is a
+        pre-filter over this index, not a separate file or unit of work: a
+        query over several categories scores their union in one pass.
+        Returns ``None`` when none of the categories is known, and the index
+        itself when the categories cover every server.
+        """
+        keys = tuple(
+            sorted(
+                {normalize_category(c) for c in categories}
+                & self.category_servers.keys()
+            )
+        )
+        if not keys:
+            return None
+        shard = self._shards.get(keys)
+        if shard is None:
+            members = np.unique(
+                np.concatenate([self.category_servers[key] for key in keys])
+            )
+            if len(members) == len(self.servers):
+                return self
+            shard = self._subset(members)
+            self._shards[keys] = shard
+        return shard
+
+    def _subset(self, server_indices: np.ndarray) -> "CatalogIndex":
+        rows = self.tool_rows_for(server_indices)
+        counts = (
+            self.tool_offsets[server_indices + 1] - self.tool_offsets[server_indices]
+        )
+        tool_server = np.repeat(np.arange(len(server_indices)), counts)
+        subset = CatalogIndex(
+            servers=[self.servers[i] for i in server_indices],
+            tools=[self.tools[row] for row in rows],
+            server_vectors=np.concatenate(
+                [self.server_desc[server_indices], self.server_summary[server_indices]]
+            ),
+            server_mask=self.server_mask[server_indices],
+            tool_matrix=np.asarray(self.tool_matrix[rows], dtype=np.float32),
+            tool_server=tool_server.astype(np.int32),
+            tool_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            source=self.source,
+        )
+        if self._quantizer is not None:
+            subset.quantize(self._quantizer)
+        return subset
+
+    def server_scores(self, query: np.ndarray) -> np.ndarray:
+        """Score every server as ``max(desc, summary)`` cosine similarity.
+
+        Servers without a description embedding get ``-inf`` so they are never
+        selected. When the index is quantized the scores are approximate; use
+        ``exact_server_scores`` to rescore candidates.
+        """
+        self.check_query(query)
+        if self.server_quantized is not None:
+            both = self.server_quantized.dot(query)
+            scores = np.maximum(both[: len(self.servers)], both[len(self.servers) :])
+        else:
+            scores = np.maximum(self.server_desc @ query, self.server_summary @ query)
+        scores[~self.server_mask] = -np.inf
+        return scores
+
+    def exact_server_scores(self, query: np.ndarray, servers: np.ndarray) -> np.ndarray:
+        """Float32 ``max(desc, summary)`` scores of the given servers."""
+        return np.maximum(
+            self.server_desc[servers] @ query, self.server_summary[servers] @ query
+        )
+
+    def tool_scores(
+        self, query: np.ndarray, rows: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Cosine similarity of the given tool rows (every tool if ``rows`` is None).
+
+        Approximate when the index is quantized, like ``server_scores``.
+        """
+        self.check_query(query)
+        if self.tool_quantized is not None:
+            return self.tool_quantized.dot(query, rows)
+        matrix = self.tool_matrix if rows is None else self.tool_matrix[rows]
+        return matrix @ query
+
+    def server_scores_many(self, queries: np.ndarray) -> np.ndarray:
+        """``server_scores`` for a ``(num_queries, dimensions)`` batch at once."""
+        n = len(self.servers)
+        scores = queries @ self.server_vectors.T
+        scores = np.maximum(scores[:, :n], scores[:, n:])
+        scores[:, ~self.server_mask] = -np.inf
+        return scores
+
+    def build_lexical_index(self) -> tuple[BM25Index, BM25Index]:
+        """Build BM25 inverted indexes over server and tool text, once."""
+        with self._lexical_lock:
+            if self._lexical is None:
+                self._lexical = (
+                    BM25Index([server_document(s) for s in self.servers]),
+                    BM25Index([tool_document(t) for t in self.tools]),
+                )
+            return self._lexical
+
+    @property
+    def server_lexical(self) -> BM25Index:
+        return self.build_lexical_index()[0]
+
+    @property
+    def tool_lexical(self) -> BM25Index:
+        return self.build_lexical_index()[1]
+
+    def searchable_server_rows(self) -> np.ndarray:
+        """Rows of ``server_vectors`` belonging to servers that can be matched."""
+        searchable = np.flatnonzero(self.server_mask)
+        return np.concatenate([searchable, searchable + len(self.servers)])
+
+    def tool_rows_for(self, server_indices: np.ndarray) -> np.ndarray:
+        """Row numbers in ``tool_matrix`` of every tool of the given servers."""
+        starts = self.tool_offsets[server_indices]
+        ends = self.tool_offsets[server_indices + 1]
+        if len(starts) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(
+            [np.arange(start, end) for start, end in zip(starts, ends)]
+        )
+
+
+def _infer_dimensions(servers_data: list[dict[str, Any]]) -> int:
+    for server in servers_data:
+        for key in EMBEDDING_KEYS:
+            if server.get(key):
+                return len(server[key])
+        for tool in server.get("tools") or []:
+            if tool.get("description_embedding"):
+                return len(tool["description_embedding"])
+    return 0
+
+
+def _fill_row(
+    matrix: np.ndarray, row: int, embedding: Any, server: dict[str, Any]
+) -> None:
+    if not embedding:
+        return
+    if len(embedding) != matrix.shape[1]:
+        logger.warning(
+            f"Skipping embedding of size {len(embedding)} for server "
+            f"{server.get('server_name')}, expected {matrix.shape[1]}"
+        )
+        return
+    matrix[row] = embedding
@@ -0,0 +1,97 @@
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+CAMEL_CASE_PATTERN = re.compile(r"([a-z0-9])([A-Z])")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+")
+CJK_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens.
+
+    Latin words are split on camelCase, underscores and punctuation. Chinese
+    has no word boundaries, so runs of CJK characters become unigrams plus
+    bigrams.
+    """
+    text = CAMEL_CASE_PATTERN.sub(r"\1 \2", text or "").lower()
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if CJK_PATTERN.match(token):
+            tokens.extend(token)
+            tokens.extend(token[i : i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring.
+
+    Each posting list stores document ids together with the precomputed BM25
+    term weight, so scoring a query is a weighted ``bincount`` over the
+    postings of its terms.
+    """
+
+    def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+        self.num_docs = len(documents)
+        term_docs = defaultdict(list)
+        term_freqs = defaultdict(list)
+        doc_len = np.zeros(self.num_docs, dtype=np.float32)
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            doc_len[doc_id] = sum(counts.values())
+            for term, count in counts.items():
+                term_docs[term].append(doc_id)
+                term_freqs[term].append(count)
+
+        avg_len = float(doc_len.mean()) if self.num_docs else 0.0
+        if avg_len:
+            norm = k1 * (1 - b + b * doc_len / avg_len)
+        else:
+            norm = np.full_like(doc_len, k1)
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for term, docs in term_docs.items():
+            doc_ids = np.asarray(docs, dtype=np.int64)
+            tf = np.asarray(term_freqs[term], dtype=np.float32)
+            idf = np.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            weights = idf * tf * (k1 + 1) / (tf + norm[doc_ids])
+            self.postings[term] = (doc_ids, weights.astype(np.float32))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for ``query``."""
+        postings = [
+            self.postings[t] for t in set(tokenize(query)) if t in self.postings
+        ]
+        if not postings:
+            return np.zeros(self.num_docs, dtype=np.float32)
+        doc_ids = np.concatenate([p[0] for p in postings])
+        weights = np.concatenate([p[1] for p in postings])
+        return np.bincount(doc_ids, weights=weights, minlength=self.num_docs).astype(
+            np.float32
+        )
+
+
+def max_normalize(scores: np.ndarray) -> np.ndarray:
+    """Scale non-negative scores into ``[0, 1]`` so they can be fused with cosine."""
+    top = scores.max() if len(scores) else 0
+    if top <= 0:
+        return scores
+    return scores / top
+
+
+def server_document(server: dict) -> str:
+    tool_names = " ".join(tool.get("name", "") for tool in server.get("tools") or [])
+    return " ".join(
+        [
+            server.get("server_name") or "",
+            server.get("server_summary") or "",
+            server.get("server_description") or "",
+            tool_names,
+        ]
+    )
+
+
+def tool_document(tool: dict) -> str:
+    return f"{tool.get('name') or ''} {tool.get('description') or ''}"
@@ -1,15 +1,36 @@
 # from mcp zero
 # https://github.com/xfey/MCP-Zero/blob/master/MCP-zero/matcher.py
-import json
+import asyncio
+import logging
 import numpy as np
 import re
-import time
+from functools import partial
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Tuple, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from openai import BadRequestError
 
+from mcp_copilot.ann import ann_path, build_search
+from mcp_copilot.embedding_cache import EmbeddingCache, normalize_text
+from mcp_copilot.index import (
+    CatalogIndex,
+    index_is_current,
+    normalize_vector,
+    split_categories,
+    top_k_indices,
+)
+from mcp_copilot.lexical import max_normalize
+from mcp_copilot.metrics import stage_metrics
+from mcp_copilot.quantization import VECTOR_STORAGES, QuantizedMatrix
+from mcp_copilot.rate_limit import rate_limiter
+
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+SEARCH_MODES = ("two_stage", "flat")
+# flat search with an ANN backend rescores this many candidates per result
+FLAT_ANN_CANDIDATES = 10
 
 
 class ToolMatcher:
@@ -19,30 +40,146 @@ class ToolMatcher:
         dimensions: int,
         top_servers: int = 5,
         top_tools: int = 3,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        search_backend: str = "exact",
+        ann_params: Optional[Dict[str, Any]] = None,
+        retrieval_mode: str = "dense",
+        lexical_weight: float = 0.3,
+        lexical_fallback: bool = False,
+        embedding_batch_size: int = 256,
+        search_mode: str = "two_stage",
+        vector_storage: str = "float32",
+        rescore_factor: int = 4,
+        reduce_dimensions: bool = False,
+        embedding_max_wait: Optional[float] = None,
     ):
         self.embedding_model = embedding_model
         self.dimensions = dimensions
+        # serve at ``dimensions``: request it from the API and truncate longer
+        # (Matryoshka) vectors, both in the index and in queries
+        self.reduce_dimensions = reduce_dimensions
+        # vectors only have ``dimensions`` components when requested that way;
+        # cache keys follow the index builder's so both share one store
+        self._cache_dimensions = dimensions if reduce_dimensions else None
         self.top_servers = top_servers
         self.top_tools = top_tools
         self.servers_data = None
+        self.index: Optional[CatalogIndex] = None
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        # shared with the index builder, which calls the same embedding API
+        self.rate_limiter = rate_limiter("embedding")
+        # longest a query waits on the limiter (pauses, retries) before the
+        # embedding is given up, so routing falls back instead of stalling
+        self.embedding_max_wait = embedding_max_wait
+        self.search_backend = search_backend
+        self.ann_params = ann_params or {}
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(
+                f"Unknown retrieval mode '{retrieval_mode}', "
+                f"expected one of {RETRIEVAL_MODES}"
+            )
+        # dense: cosine only; hybrid: cosine fused with BM25; lexical: BM25 only
+        self.retrieval_mode = retrieval_mode
+        self.lexical_weight = lexical_weight
+        self.lexical_fallback = lexical_fallback
+        self.embedding_batch_size = embedding_batch_size
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(
+                f"Unknown search mode '{search_mode}', expected one of {SEARCH_MODES}"
+            )
+        # two_stage: prune to top servers first; flat: one pass over all tools
+        self.search_mode = search_mode
+        if vector_storage not in VECTOR_STORAGES:
+            raise ValueError(
+                f"Unknown vector storage '{vector_storage}', "
+                f"expected one of {VECTOR_STORAGES}"
+            )
+        # float16/int8 keep a quantized copy in memory for the first pass
+        self.vector_storage = vector_storage
+        self.rescore_factor = rescore_factor
         self.tool_assistant_pattern = re.compile(
-            r"<tool_assistant>\s*server:\s*(.*?)\s*tool:\s*(.*?)\s*</tool_assistant>",
+            # the category hint only counts on its own line, so "category:"
+            # inside a tool description stays part of the description
+            r"<tool_assistant>\s*server:\s*(.*?)\s*tool:\s*(.*?)\s*"
+            r"(?:\n\s*category:\s*(.*?)\s*)?</tool_assistant>",
             re.DOTALL,
         )
         self.openai_client = None
+        self.async_openai_client = None
 
     def load_data(self, data_path: str) -> None:
         try:
-            with open(data_path, "r", encoding="utf-8") as f:
-                self.servers_data = json.load(f)
-            print(f"Loaded {len(self.servers_data)} servers from {data_path}")
+            self.swap_index(self.build_index(data_path))
+            logger.info(
+                f"Loaded {len(self.index)} servers and {self.index.num_tools} tools "
+                f"from {data_path}"
+            )
         except Exception as e:
             raise ValueError(f"Error loading tool data: {e}")
 
+    def build_index(self, data_path: str) -> CatalogIndex:
+        """Load the catalog and build every search structure, without publishing it.
+
+        This is safe to run in a worker thread while the current index keeps
+        serving; publish the result with ``swap_index``.
+        """
+        dimensions = self.dimensions if self.reduce_dimensions else None
+        index = CatalogIndex.from_path(data_path, dimensions=dimensions)
+        # a catalog already embedded at this size is served from the full
+        # sidecar, and its ANN files and float32 copy live beside that one
+        dimensions = index.sidecar_dimensions
+        if self.vector_storage != "float32":
+            if not isinstance(index.tool_matrix, np.memmap) and index_is_current(
+                data_path, dimensions
+            ):
+                # keep the float32 rescoring copy on disk instead of in memory
+                index = CatalogIndex.load(data_path, dimensions=dimensions)
+            index.quantize(
+                partial(QuantizedMatrix.from_float32, storage=self.vector_storage)
+            )
+        if self.search_backend != "exact":
+            index.server_search = build_search(
+                self.search_backend,
+                index.server_vectors,
+                ids=index.searchable_server_rows(),
+                path=ann_path(data_path, "servers", self.search_backend, dimensions),
+                source=index.source,
+                **self.ann_params,
+            )
+            if self.search_mode == "flat":
+                index.tool_search = build_search(
+                    self.search_backend,
+                    index.tool_matrix,
+                    path=ann_path(data_path, "tools", self.search_backend, dimensions),
+                    source=index.source,
+                    **self.ann_params,
+                )
+        # hybrid and lexical modes score BM25 on every query; the fallback
+        # builds it on the first failed embedding instead of at every load
+        if self.retrieval_mode != "dense":
+            index.build_lexical_index()
+        return index
+
+    def swap_index(self, index: CatalogIndex) -> None:
+        """Atomically replace the served index.
+
+        Matching reads ``self.index`` once per query and uses that snapshot
+        throughout, so in-flight queries finish on the index they started with.
+        """
+        self.index = index
+        self.servers_data = index.servers
+
     def setup_openai_client(self, base_url: str, api_key: str) -> None:
+        # retries and backoff are left to the shared rate limiter
         self.openai_client = OpenAI(
             base_url=base_url,
             api_key=api_key,
+            max_retries=0,
+        )
+        self.async_openai_client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            max_retries=0,
         )
 
     def extract_tool_assistant(self, text: str) -> Tuple[Optional[str], Optional[str]]:
@@ -55,35 +192,175 @@ class ToolMatcher:
             return text, text
         return None, None
 
+    def extract_category(self, text: str) -> Optional[str]:
+        """The optional ``category:`` line of the <tool_assistant> tag.
+
+        >>> matcher = ToolMatcher(embedding_model="m", dimensions=8)
+        >>> matcher.extract_category(
+        ...     "<tool_assistant>\\nserver: shop\\ntool: list products\\n"
+        ...     "category: Finance\\n</tool_assistant>"
+        ... )
+        'Finance'
+        >>> query = (
+        ...     "<tool_assistant>\\nserver: shop\\n"
+        ...     "tool: list products filtered by category: books\\n</tool_assistant>"
+        ... )
+        >>> matcher.extract_category(query) is None
+        True
+        >>> matcher.extract_tool_assistant(query)[1]
+        'list products filtered by category: books'
+        """
+        match = self.tool_assistant_pattern.search(text)
+        if match and match.group(3):
+            return match.group(3).strip()
+        return None
+
+    def _select_index(
+        self, index: CatalogIndex, category: Optional[str]
+    ) -> CatalogIndex:
+        """The category shard to search, or the whole index without a usable hint."""
+        if not category:
+            return index
+        shard = index.shard(split_categories(category))
+        return shard if shard is not None else index
+
     def get_embedding(self, text: str, max_retries: int = 3) -> Optional[List[float]]:
+        embeddings = self.get_embeddings([text], max_retries=max_retries)
+        return embeddings[0] if embeddings else None
+
+    async def aget_embedding(
+        self, text: str, max_retries: int = 3
+    ) -> Optional[List[float]]:
+        """Async counterpart of ``get_embedding`` that never blocks the event loop."""
+        embeddings = await self.aget_embeddings([text], max_retries=max_retries)
+        return embeddings[0] if embeddings else None
+
+    def get_embeddings(
+        self, texts: List[str], max_retries: int = 3
+    ) -> Optional[List[List[float]]]:
+        """Embed several texts with at most one ``embeddings.create`` request.
+
+        Texts are deduplicated and looked up in the embedding cache first; only
+        the remaining ones are sent, in a single batched request.
+        """
         if not self.openai_client:
             raise ValueError(
                 "OpenAI client not initialized. Call setup_openai_client first."
             )
+        embeddings, missing = self._lookup_cached(texts)
+        if not missing:
+            return [embeddings[normalize_text(text)] for text in texts]
 
-        for attempt in range(max_retries):
-            try:
-                time.sleep(0.05)
-                response = self.openai_client.embeddings.create(
-                    input=[text],
+        def create() -> Any:
+            with stage_metrics.time("matcher.embedding_request"):
+                return self.openai_client.embeddings.create(
+                    input=missing,
                     model=self.embedding_model,
-                    # dimensions=self.dimensions,
-                    # encoding_format="float",
+                    **self._dimension_args(),
                 )
-                return response.data[0].embedding
-            except BadRequestError as e:
-                print("400 message:", e.message)
-                if getattr(e, "response", None) is not None:
-                    print("400 response:", e.response.text)
-                raise
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = 2**attempt
-                    print(f"Error getting embedding, retrying in {wait_time}s: {e}")
-                    time.sleep(wait_time)
-                else:
-                    print(f"Failed to get embedding after {max_retries} attempts: {e}")
-                    return None
+
+        try:
+            response = self.rate_limiter.call(
+                create, max_retries=max_retries, max_wait=self.embedding_max_wait
+            )
+        except BadRequestError as e:
+            logger.warning(f"Embedding request rejected (400): {e.message}")
+            if getattr(e, "response", None) is not None:
+                logger.warning(f"400 response: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to get embedding: {e}")
+            return None
+        self.embedding_cache.put_many(
+            self.embedding_model,
+            self._cache_dimensions,
+            self._read_response(embeddings, missing, response),
+        )
+        return [embeddings[normalize_text(text)] for text in texts]
+
+    async def aget_embeddings(
+        self, texts: List[str], max_retries: int = 3
+    ) -> Optional[List[List[float]]]:
+        """Async counterpart of ``get_embeddings``."""
+        if not self.async_openai_client:
+            raise ValueError(
+                "OpenAI client not initialized. Call setup_openai_client first."
+            )
+        embeddings, missing = self._lookup_cached(texts)
+        if not missing:
+            return [embeddings[normalize_text(text)] for text in texts]
+
+        async def create() -> Any:
+            with stage_metrics.time("matcher.embedding_request"):
+                return await self.async_openai_client.embeddings.create(
+                    input=missing,
+                    model=self.embedding_model,
+                    **self._dimension_args(),
+                )
+
+        try:
+            response = await self.rate_limiter.acall(
+                create, max_retries=max_retries, max_wait=self.embedding_max_wait
+            )
+        except BadRequestError as e:
+            logger.warning(f"Embedding request rejected (400): {e.message}")
+            if getattr(e, "response", None) is not None:
+                logger.warning(f"400 response: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to get embedding: {e}")
+            return None
+        # one SQLite transaction, written off the event loop
+        await self.embedding_cache.aput_many(
+            self.embedding_model,
+            self._cache_dimensions,
+            self._read_response(embeddings, missing, response),
+        )
+        return [embeddings[normalize_text(text)] for text in texts]
+
+    def _dimension_args(self) -> Dict[str, Any]:
+        """Extra ``embeddings.create`` arguments for a reduced dimension."""
+        if self.reduce_dimensions:
+            return {"dimensions": self.dimensions}
+        return {}
+
+    def _query_vector(self, embedding: List[float]) -> np.ndarray:
+        """Normalized query vector, truncated to ``dimensions`` when reducing."""
+        if self.reduce_dimensions:
+            embedding = embedding[: self.dimensions]
+        return normalize_vector(embedding)
+
+    def _lookup_cached(
+        self, texts: List[str]
+    ) -> Tuple[Dict[str, List[float]], List[str]]:
+        """Split texts into cached embeddings and unique texts still to embed."""
+        embeddings = {}
+        missing = []
+        pending = set()
+        for text in texts:
+            key = normalize_text(text)
+            if key in embeddings or key in pending:
+                continue
+            cached = self.embedding_cache.get(
+                self.embedding_model, self._cache_dimensions, text
+            )
+            if cached is not None:
+                embeddings[key] = cached
+            else:
+                pending.add(key)
+                missing.append(text)
+        return embeddings, missing
+
+    def _read_response(
+        self, embeddings: Dict[str, List[float]], missing: List[str], response: Any
+    ) -> List[tuple[str, List[float]]]:
+        """Fill ``embeddings`` from ``response``; returns the new pairs."""
+        new = []
+        for item in sorted(response.data, key=lambda d: d.index):
+            text = missing[item.index]
+            embeddings[normalize_text(text)] = item.embedding
+            new.append((text, item.embedding))
+        return new
 
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         vec1 = np.array(vec1)
@@ -100,22 +377,7 @@ class ToolMatcher:
         query_embedding = self.get_embedding(server_desc)
         if not query_embedding:
             raise ValueError("Failed to get embedding for server description")
-        server_scores = []
-        for server in self.servers_data:
-            if "description_embedding" not in server:
-                continue
-            desc_similarity = self.cosine_similarity(
-                query_embedding, server["description_embedding"]
-            )
-            summary_similarity = 0
-            if "summary_embedding" in server:
-                summary_similarity = self.cosine_similarity(
-                    query_embedding, server["summary_embedding"]
-                )
-            final_score = max(desc_similarity, summary_similarity)
-            server_scores.append({"server": server, "score": final_score})
-        server_scores.sort(key=lambda x: x["score"], reverse=True)
-        return server_scores[: self.top_servers]
+        return self._rank_servers(self._query_vector(query_embedding), server_desc)
 
     def match_tools(
         self, server_list: List[Dict[str, Any]], tool_desc: str
@@ -123,65 +385,560 @@ class ToolMatcher:
         query_embedding = self.get_embedding(tool_desc)
         if not query_embedding:
             raise ValueError("Failed to get embedding for tool description")
-        tool_scores = []
-        for server_info in server_list:
-            server = server_info["server"]
-            server_score = server_info["score"]
-            if "tools" not in server or not server["tools"]:
-                continue
-            for tool in server["tools"]:
-                if "description_embedding" not in tool:
-                    continue
-                tool_similarity = self.cosine_similarity(
-                    query_embedding, tool["description_embedding"]
-                )
-                final_score = (server_score * tool_similarity) * max(
-                    server_score, tool_similarity
-                )
-                tool_scores.append(
-                    {
-                        "server_name": server["server_name"],
-                        "tool_name": tool["name"],
-                        "tool_description": tool.get("description", ""),
-                        "inputschema": tool.get("parameter", {}),
-                        "server_score": server_score,
-                        "tool_score": tool_similarity,
-                        "final_score": final_score,
-                    }
+        return self._rank_tools(
+            server_list, self._query_vector(query_embedding), tool_desc
+        )
+
+    async def amatch_servers(self, server_desc: str) -> List[Dict[str, Any]]:
+        if not self.servers_data:
+            raise ValueError("No server data loaded. Call load_data first.")
+        query_embedding = await self.aget_embedding(server_desc)
+        if not query_embedding:
+            raise ValueError("Failed to get embedding for server description")
+        return self._rank_servers(self._query_vector(query_embedding), server_desc)
+
+    async def amatch_tools(
+        self, server_list: List[Dict[str, Any]], tool_desc: str
+    ) -> List[Dict[str, Any]]:
+        query_embedding = await self.aget_embedding(tool_desc)
+        if not query_embedding:
+            raise ValueError("Failed to get embedding for tool description")
+        return self._rank_tools(
+            server_list, self._query_vector(query_embedding), tool_desc
+        )
+
+    def _rank_servers(
+        self,
+        query: Optional[np.ndarray],
+        text: Optional[str] = None,
+        index: Optional[CatalogIndex] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top servers for a query embedding and/or the raw description text.
+
+        ``query`` is ``None`` when only lexical scoring is possible, either in
+        lexical mode or after the embedding request failed.
+        """
+        if index is None:
+            index = self.index
+        if (
+            query is not None
+            and index.server_search is not None
+            and self.retrieval_mode == "dense"
+        ):
+            return self._search_servers(index, query)
+        scores = self._server_score_vector(index, query, text)
+        top = top_k_indices(scores, min(self.top_servers, index.num_searchable))
+        return [
+            {"server": index.servers[i], "score": float(scores[i]), "index": int(i)}
+            for i in top
+        ]
+
+    def _server_score_vector(
+        self, index: CatalogIndex, query: Optional[np.ndarray], text: Optional[str]
+    ) -> np.ndarray:
+        """Score of every server; unsearchable servers get ``-inf``."""
+        dense = lexical = None
+        if query is not None and self.retrieval_mode != "lexical":
+            dense = index.server_scores(query)
+            if index.quantized:
+                candidates = top_k_indices(
+                    dense, self.rescore_factor * self.top_servers
                 )
-        tool_scores.sort(key=lambda x: x["final_score"], reverse=True)
-        return tool_scores[: self.top_tools]
+                dense[candidates] = index.exact_server_scores(query, candidates)
+        if query is None or self.retrieval_mode != "dense":
+            lexical = max_normalize(index.server_lexical.scores(text or ""))
+        scores = self._fuse_scores(dense, lexical)
+        scores[~index.server_mask] = -np.inf
+        return scores
 
-    def match(self, input_text: str) -> Dict[str, Any]:
+    def _search_servers(
+        self, index: CatalogIndex, query: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Server stage through the ANN backend.
+
+        Description and summary rows are searched together; a server appears at
+        most twice among the best ``2 * top_servers`` rows, and the first
+        occurrence is its ``max(desc, summary)`` score.
+        """
+        index.check_query(query)
+        rows, scores = index.server_search.search(
+            query, 2 * self.top_servers, **self.ann_params
+        )
+        servers = rows % len(index)
+        _, first = np.unique(servers, return_index=True)
+        first.sort()
+        return [
+            {
+                "server": index.servers[servers[i]],
+                "score": float(scores[i]),
+                "index": int(servers[i]),
+            }
+            for i in first[: self.top_servers]
+        ]
+
+    def _rank_tools(
+        self,
+        server_list: List[Dict[str, Any]],
+        query: Optional[np.ndarray],
+        text: Optional[str] = None,
+        index: Optional[CatalogIndex] = None,
+    ) -> List[Dict[str, Any]]:
+        if index is None:
+            index = self.index
+        rows, tool_server_score = self._tool_candidates(index, server_list)
+        if len(rows) == 0:
+            return []
+        tool_similarity = self._tool_similarity(index, rows, query, text)
+        return self._top_tools(index, rows, tool_similarity, tool_server_score)
+
+    def _rank_tools_flat(
+        self,
+        server_query: Optional[np.ndarray],
+        tool_query: Optional[np.ndarray],
+        server_text: Optional[str] = None,
+        tool_text: Optional[str] = None,
+        index: Optional[CatalogIndex] = None,
+    ) -> List[Dict[str, Any]]:
+        """Single-stage search over every tool in the catalog.
+
+        Each tool's server score is folded in with the same
+        ``(server * tool) * max(server, tool)`` formula as the two-stage path,
+        so no tool is lost to server pruning. With an ANN backend in dense mode
+        only the ``FLAT_ANN_CANDIDATES * top_tools`` nearest tools are scored.
+        """
+        if index is None:
+            index = self.index
+        server_scores = self._server_score_vector(index, server_query, server_text)
+        if (
+            tool_query is not None
+            and index.tool_search is not None
+            and self.retrieval_mode == "dense"
+        ):
+            index.check_query(tool_query)
+            rows, tool_similarity = index.tool_search.search(
+                tool_query, FLAT_ANN_CANDIDATES * self.top_tools, **self.ann_params
+            )
+        else:
+            rows = None
+            tool_similarity = self._tool_similarity(index, None, tool_query, tool_text)
+
+        tool_servers = index.tool_server if rows is None else index.tool_server[rows]
+        searchable = index.server_mask[tool_servers]
+        if rows is None:
+            rows = np.flatnonzero(searchable)
+        else:
+            rows = rows[searchable]
+        tool_similarity = tool_similarity[searchable]
+        tool_server_score = server_scores[tool_servers[searchable]]
+        return self._top_tools(index, rows, tool_similarity, tool_server_score)
+
+    def _tool_similarity(
+        self,
+        index: CatalogIndex,
+        rows: Optional[np.ndarray],
+        query: Optional[np.ndarray],
+        text: Optional[str],
+    ) -> np.ndarray:
+        """Similarity of the given tool rows (every tool if ``rows`` is None).
+
+        A candidate subset is always scored in float32. A full pass over a
+        quantized index is approximate, and only its best
+        ``rescore_factor * top_tools`` rows are rescored in float32.
+        """
+        dense = lexical = None
+        if query is not None and self.retrieval_mode != "lexical":
+            index.check_query(query)
+            if rows is not None:
+                dense = index.tool_matrix[rows] @ query
+            else:
+                dense = index.tool_scores(query)
+                if index.quantized:
+                    candidates = top_k_indices(
+                        dense, self.rescore_factor * self.top_tools
+                    )
+                    dense[candidates] = index.tool_matrix[candidates] @ query
+        if query is None or self.retrieval_mode != "dense":
+            lexical = index.tool_lexical.scores(text or "")
+            lexical = max_normalize(lexical if rows is None else lexical[rows])
+        return self._fuse_scores(dense, lexical)
+
+    def _tool_candidates(
+        self, index: CatalogIndex, server_list: List[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Tool rows of the matched servers and each row's server score.
+
+        Servers are located by their position when ``server_list`` came from
+        the same index snapshot, and by name otherwise (e.g. after a reload);
+        servers no longer in the index are dropped.
+        """
+        positions, scores = [], []
+        for info in server_list:
+            position = info.get("index")
+            if (
+                position is None
+                or position >= len(index)
+                or (index.servers[position] is not info["server"])
+            ):
+                position = index.server_position.get(info["server"]["server_name"])
+            if position is not None:
+                positions.append(position)
+                scores.append(info["score"])
+        server_indices = np.asarray(positions, dtype=np.int64)
+        server_scores = np.asarray(scores, dtype=np.float32)
+        rows = index.tool_rows_for(server_indices)
+        tool_server_score = np.repeat(
+            server_scores,
+            index.tool_offsets[server_indices + 1] - index.tool_offsets[server_indices],
+        )
+        return rows, tool_server_score
+
+    def _top_tools(
+        self,
+        index: CatalogIndex,
+        rows: np.ndarray,
+        tool_similarity: np.ndarray,
+        tool_server_score: np.ndarray,
+    ) -> List[Dict[str, Any]]:
+        final_scores = (tool_server_score * tool_similarity) * np.maximum(
+            tool_server_score, tool_similarity
+        )
+        tool_scores = []
+        for i in top_k_indices(final_scores, self.top_tools):
+            row = rows[i]
+            tool = index.tools[row]
+            tool_scores.append(
+                {
+                    "server_name": index.servers[index.tool_server[row]]["server_name"],
+                    "tool_name": tool["name"],
+                    "tool_description": tool.get("description", ""),
+                    "inputschema": tool.get("parameter", {}),
+                    "server_score": float(tool_server_score[i]),
+                    "tool_score": float(tool_similarity[i]),
+                    "final_score": float(final_scores[i]),
+                }
+            )
+        return tool_scores
+
+    def _fuse_scores(
+        self, dense: Optional[np.ndarray], lexical: Optional[np.ndarray]
+    ) -> np.ndarray:
+        if lexical is None:
+            return dense
+        if dense is None:
+            return lexical
+        return (1 - self.lexical_weight) * dense + self.lexical_weight * lexical
+
+    def match(self, input_text: str, category: Optional[str] = None) -> Dict[str, Any]:
+        """Route one query.
+
+        ``category`` (comma-separated, or a ``category:`` line in the tag)
+        restricts the search to the shard of those categories; unknown
+        categories are ignored.
+        """
         server_desc, tool_desc = self.extract_tool_assistant(input_text)
         if not server_desc or not tool_desc:
-            return {
-                "success": False,
-                "error": "No tool_assistant tag found or invalid format",
-                "matched_servers": [],
-                "matched_tools": [],
-            }
+            return self._invalid_query_result()
         try:
-            matched_servers = self.match_servers(server_desc)
-            matched_tools = self.match_tools(matched_servers, tool_desc)
-            simplified_tools = []
-            for tool in matched_tools:
-                simplified_tools.append(
+            if not self.servers_data:
+                raise ValueError("No server data loaded. Call load_data first.")
+            index = self._select_index(
+                self.index, category or self.extract_category(input_text)
+            )
+            embeddings = None
+            if self.retrieval_mode != "lexical":
+                try:
+                    with stage_metrics.time("matcher.embedding"):
+                        embeddings = self.get_embeddings([server_desc, tool_desc])
+                except Exception as e:
+                    if not self.lexical_fallback:
+                        raise
+                    logger.warning(
+                        f"Embedding failed, falling back to lexical search: {e}"
+                    )
+                if not embeddings and not self.lexical_fallback:
+                    raise ValueError("Failed to get embedding for query")
+            return self._match_queries(server_desc, tool_desc, embeddings, index=index)
+        except Exception as e:
+            return self._error_result(e, server_desc, tool_desc)
+
+    async def amatch(
+        self, input_text: str, category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Async version of ``match``; the embedding request is awaited."""
+        server_desc, tool_desc = self.extract_tool_assistant(input_text)
+        if not server_desc or not tool_desc:
+            return self._invalid_query_result()
+        try:
+            if not self.servers_data:
+                raise ValueError("No server data loaded. Call load_data first.")
+            index = self._select_index(
+                self.index, category or self.extract_category(input_text)
+            )
+            embeddings = None
+            if self.retrieval_mode != "lexical":
+                try:
+                    with stage_metrics.time("matcher.embedding"):
+                        embeddings = await self.aget_embeddings(
+                            [server_desc, tool_desc]
+                        )
+                except Exception as e:
+                    if not self.lexical_fallback:
+                        raise
+                    logger.warning(
+                        f"Embedding failed, falling back to lexical search: {e}"
+                    )
+                if not embeddings and not self.lexical_fallback:
+                    raise ValueError("Failed to get embedding for query")
+            return self._match_queries(server_desc, tool_desc, embeddings, index=index)
+        except Exception as e:
+            return self._error_result(e, server_desc, tool_desc)
+
+    def match_many(self, input_texts: List[str]) -> List[Dict[str, Any]]:
+        """Route many queries at once, returning one result per query in order.
+
+        Query texts are deduplicated and embedded in batches of
+        ``embedding_batch_size``; a failed batch only fails the queries that
+        needed it.
+        """
+        parsed = [self.extract_tool_assistant(text) for text in input_texts]
+        embeddings, errors = {}, {}
+        if self.retrieval_mode != "lexical":
+            for batch in self._embedding_batches(parsed):
+                try:
+                    result = self.get_embeddings(batch)
+                except Exception as e:
+                    result, error = None, str(e)
+                else:
+                    error = "Failed to get embedding for query"
+                self._collect_batch(batch, result, error, embeddings, errors)
+        categories = [self.extract_category(text) for text in input_texts]
+        return self._match_parsed(parsed, embeddings, errors, categories)
+
+    async def amatch_many(self, input_texts: List[str]) -> List[Dict[str, Any]]:
+        """Async version of ``match_many``; embedding batches are sent concurrently."""
+        parsed = [self.extract_tool_assistant(text) for text in input_texts]
+        embeddings, errors = {}, {}
+        if self.retrieval_mode != "lexical":
+            batches = self._embedding_batches(parsed)
+            results = await asyncio.gather(
+                *(self.aget_embeddings(batch) for batch in batches),
+                return_exceptions=True,
+            )
+            for batch, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    result, error = None, str(result)
+                else:
+                    error = "Failed to get embedding for query"
+                self._collect_batch(batch, result, error, embeddings, errors)
+        categories = [self.extract_category(text) for text in input_texts]
+        return self._match_parsed(parsed, embeddings, errors, categories)
+
+    def _embedding_batches(
+        self, parsed: List[Tuple[Optional[str], Optional[str]]]
+    ) -> List[List[str]]:
+        texts = {}
+        for server_desc, tool_desc in parsed:
+            if server_desc and tool_desc:
+                texts.setdefault(normalize_text(server_desc), server_desc)
+                texts.setdefault(normalize_text(tool_desc), tool_desc)
+        unique = list(texts.values())
+        size = self.embedding_batch_size
+        return [unique[i : i + size] for i in range(0, len(unique), size)]
+
+    def _collect_batch(
+        self,
+        batch: List[str],
+        result: Optional[List[List[float]]],
+        error: str,
+        embeddings: Dict[str, List[float]],
+        errors: Dict[str, str],
+    ) -> None:
+        if result:
+            for text, embedding in zip(batch, result):
+                embeddings[normalize_text(text)] = embedding
+        else:
+            for text in batch:
+                errors[normalize_text(text)] = error
+
+    def _match_parsed(
+        self,
+        parsed: List[Tuple[Optional[str], Optional[str]]],
+        embeddings: Dict[str, List[float]],
+        errors: Dict[str, str],
+        categories: Optional[List[Optional[str]]] = None,
+    ) -> List[Dict[str, Any]]:
+        index = self.index
+        results: List[Optional[Dict[str, Any]]] = [None] * len(parsed)
+        dense_batch = []
+        for i, (server_desc, tool_desc) in enumerate(parsed):
+            if not server_desc or not tool_desc:
+                results[i] = self._invalid_query_result()
+                continue
+            keys = (normalize_text(server_desc), normalize_text(tool_desc))
+            try:
+                if not self.servers_data:
+                    raise ValueError("No server data loaded. Call load_data first.")
+                query_index = self._select_index(
+                    index, categories[i] if categories else None
+                )
+                if self.retrieval_mode == "lexical":
+                    results[i] = self._match_queries(
+                        server_desc, tool_desc, None, index=query_index
+                    )
+                elif all(key in embeddings for key in keys):
+                    if query_index is index:
+                        dense_batch.append(i)
+                    else:
+                        # shard queries skip the shared full-index batch
+                        results[i] = self._match_queries(
+                            server_desc,
+                            tool_desc,
+                            [embeddings[key] for key in keys],
+                            index=query_index,
+                        )
+                elif self.lexical_fallback:
+                    results[i] = self._match_queries(
+                        server_desc, tool_desc, None, index=query_index
+                    )
+                else:
+                    error = next(errors[key] for key in keys if key in errors)
+                    raise ValueError(error)
+            except Exception as e:
+                results[i] = self._error_result(e, server_desc, tool_desc)
+
+        if dense_batch:
+            queries = [
+                [embeddings[normalize_text(text)] for text in parsed[i]]
+                for i in dense_batch
+            ]
+            try:
+                with stage_metrics.time("matcher.batch_search"):
+                    batch_results = self._match_dense_batch(
+                        index, parsed, dense_batch, queries
+                    )
+            except Exception as e:
+                batch_results = [self._error_result(e, *parsed[i]) for i in dense_batch]
+            for i, result in zip(dense_batch, batch_results):
+                results[i] = result
+        return results
+
+    def _match_dense_batch(
+        self,
+        index: CatalogIndex,
+        parsed: List[Tuple[Optional[str], Optional[str]]],
+        positions: List[int],
+        queries: List[List[List[float]]],
+    ) -> List[Dict[str, Any]]:
+        """Score a batch of embedded queries with matrix-matrix products.
+
+        Hybrid mode, flat search and the ANN backend are scored query by query
+        with the single-query path.
+        """
+        if (
+            self.retrieval_mode != "dense"
+            or self.search_mode != "two_stage"
+            or index.server_search is not None
+        ):
+            return [
+                self._match_queries(*parsed[i], embeddings, index=index)
+                for i, embeddings in zip(positions, queries)
+            ]
+
+        server_queries = np.stack([self._query_vector(q[0]) for q in queries])
+        tool_queries = np.stack([self._query_vector(q[1]) for q in queries])
+        index.check_query(server_queries[0])
+        index.check_query(tool_queries[0])
+
+        server_scores = index.server_scores_many(server_queries)
+        k = min(self.top_servers, index.num_searchable)
+        server_lists = []
+        for scores in server_scores:
+            server_lists.append(
+                [
                     {
-                        "server_name": tool["server_name"],
-                        "tool_name": tool["tool_name"],
-                        "tool_description": tool["tool_description"],
-                        "inputschema": tool["inputschema"],
+                        "server": index.servers[i],
+                        "score": float(scores[i]),
+                        "index": int(i),
                     }
+                    for i in top_k_indices(scores, k)
+                ]
+            )
+
+        candidates = [self._tool_candidates(index, s) for s in server_lists]
+        all_rows = np.concatenate([rows for rows, _ in candidates])
+        union, inverse = np.unique(all_rows, return_inverse=True)
+        similarity = index.tool_matrix[union] @ tool_queries.T
+        results = []
+        start = 0
+        for q, (rows, tool_server_score) in enumerate(candidates):
+            positions_in_union = inverse[start : start + len(rows)]
+            start += len(rows)
+            matched_tools = self._top_tools(
+                index, rows, similarity[positions_in_union, q], tool_server_score
+            )
+            results.append(self._match_result(matched_tools))
+        return results
+
+    def _match_queries(
+        self,
+        server_desc: str,
+        tool_desc: str,
+        embeddings: Optional[List[List[float]]],
+        index: Optional[CatalogIndex] = None,
+    ) -> Dict[str, Any]:
+        if index is None:
+            index = self.index
+        server_query = tool_query = None
+        if embeddings:
+            server_query = self._query_vector(embeddings[0])
+            tool_query = self._query_vector(embeddings[1])
+        if self.search_mode == "flat":
+            with stage_metrics.time("matcher.flat_search"):
+                matched_tools = self._rank_tools_flat(
+                    server_query, tool_query, server_desc, tool_desc, index=index
                 )
+        else:
+            with stage_metrics.time("matcher.server_search"):
+                matched_servers = self._rank_servers(server_query, server_desc, index)
+            with stage_metrics.time("matcher.tool_search"):
+                matched_tools = self._rank_tools(
+                    matched_servers, tool_query, tool_desc, index
+                )
+        result = self._match_result(matched_tools)
+        if embeddings is None and self.retrieval_mode != "lexical":
+            # degraded answer, callers should not treat it as the dense result
+            result["fallback"] = "lexical"
+        return result
 
-            return {"success": True, "matched_tools": simplified_tools}
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "server_description": server_desc,
-                "tool_description": tool_desc,
-                "matched_servers": [],
-                "matched_tools": [],
-            }
+    def _match_result(self, matched_tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        simplified_tools = []
+        for tool in matched_tools:
+            simplified_tools.append(
+                {
+                    "server_name": tool["server_name"],
+                    "tool_name": tool["tool_name"],
+                    "tool_description": tool["tool_description"],
+                    "inputschema": tool["inputschema"],
+                }
+            )
+        return {"success": True, "matched_tools": simplified_tools}
+
+    def _invalid_query_result(self) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": "No tool_assistant tag found or invalid format",
+            "matched_servers": [],
+            "matched_tools": [],
+        }
+
+    def _error_result(
+        self, error: Exception, server_desc: str, tool_desc: str
+    ) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": str(error),
+            "server_description": server_desc,
+            "tool_description": tool_desc,
+            "matched_servers": [],
+            "matched_tools": [],
+        }
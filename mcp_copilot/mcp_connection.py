@@ -6,6 +6,7 @@ import mcp.types as types
 from mcp.client.session import ClientSession
 from mcp.client.sse import sse_client
 from mcp.client.stdio import StdioServerParameters, stdio_client
+from mcp_copilot.metrics import stage_metrics
 from mcp_copilot.schemas import Server
 import os
 
@@ -22,6 +23,10 @@ class MCPConnection:
 
     async def connect(self) -> None:
         """Establishes connection to the MCP server using STDIO or SSE."""
+        with stage_metrics.time("connection.connect"):
+            await self._connect()
+
+    async def _connect(self) -> None:
         try:
             if self.server.config.command:
                 PROXY_ENV_LIST = [
@@ -42,29 +47,34 @@ class MCPConnection:
                 server_params = StdioServerParameters(
                     **self.server.config.model_dump(include={"command", "args", "env"})
                 )
-                read, write = await self._exit_stack.enter_async_context(
-                    stdio_client(server_params)
-                )
+                with stage_metrics.time("connection.spawn"):
+                    read, write = await self._exit_stack.enter_async_context(
+                        stdio_client(server_params)
+                    )
                 session = await self._exit_stack.enter_async_context(
                     ClientSession(read, write)
                 )
-                await session.initialize()
+                with stage_metrics.time("connection.initialize"):
+                    await session.initialize()
                 self._session = session
             elif self.server.config.url:
                 # SSE connection
                 server_params = self.server.config.model_dump(
                     include={"url", "headers"}
                 )
-                read, write = await self._exit_stack.enter_async_context(
-                    sse_client(**server_params)
-                )
+                with stage_metrics.time("connection.sse_connect"):
+                    read, write = await self._exit_stack.enter_async_context(
+                        sse_client(**server_params)
+                    )
                 session = await self._exit_stack.enter_async_context(
                     ClientSession(read, write)
                 )
-                await session.initialize()
+                with stage_metrics.time("connection.initialize"):
+                    await session.initialize()
                 self._session = session
 
-            list_tools_result = await self._session.list_tools()
+            with stage_metrics.time("connection.list_tools"):
+                list_tools_result = await self._session.list_tools()
             self.server.tools = list_tools_result.tools
 
             logger.info(f"Successfully connected to server: {self.server.name}")
@@ -88,12 +98,23 @@ class MCPConnection:
             raise RuntimeError(
                 f"Server {self.server.name} not established. Call connect() first."
             )
-        return await self._session.call_tool(tool_name, params)
+        with stage_metrics.time("connection.call_tool"):
+            return await self._session.call_tool(tool_name, params)
+
+    async def ping(self) -> None:
+        """Round-trips a ping request; raises if the server is unreachable."""
+        if not self._session:
+            raise RuntimeError(
+                f"Server {self.server.name} not established. Call connect() first."
+            )
+        with stage_metrics.time("connection.ping"):
+            await self._session.send_ping()
 
     async def aclose(self) -> None:
         """Closes the connection."""
         try:
-            await self._exit_stack.aclose()
+            with stage_metrics.time("connection.close"):
+                await self._exit_stack.aclose()
             self._session = None
         except Exception as e:
             logging.warning(f"Error during cleanup of server {self.server.name}: {e}")
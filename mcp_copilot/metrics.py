@@ -0,0 +1,138 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+# upper bounds of the latency buckets in milliseconds, roughly 1-2.5-5 steps
+BUCKET_BOUNDS_MS = (
+    0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+    1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000,
+)  # fmt: skip
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; observing is O(log buckets), no samples kept."""
+
+    def __init__(self, bounds_ms: tuple[float, ...] = BUCKET_BOUNDS_MS):
+        self.bounds_ms = bounds_ms
+        # the last bucket counts everything above the largest bound
+        self.counts = [0] * (len(bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the ``q`` quantile, interpolated inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds_ms[i - 1] if i > 0 else 0.0
+                upper = self.bounds_ms[i] if i < len(self.bounds_ms) else self.max_ms
+                lower, upper = max(lower, self.min_ms), min(upper, self.max_ms)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max_ms
+
+    def snapshot(self) -> dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        buckets = {
+            f"le_{bound:g}ms": count
+            for bound, count in zip(self.bounds_ms, self.counts)
+            if count
+        }
+        if self.counts[-1]:
+            buckets["gt_max"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3),
+            "min_ms": round(self.min_ms, 3),
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p90_ms": round(self.quantile(0.9), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class StageMetrics:
+    """Named latency histograms for the stages of routing and tool execution.
+
+    Stage names are dotted, ``<component>.<stage>``, e.g. ``matcher.embedding``
+    or ``connection.initialize``. Timing can be switched off with
+    ``STAGE_METRICS=0``, which makes ``time`` a no-op.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time the ``with`` block as ``stage``, including when it raises."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: histogram.snapshot()
+                for name, histogram in sorted(self._histograms.items())
+            }
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at,
+            "stages": stages,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def dump(self, path: str | Path, extra: dict[str, Any] | None = None) -> None:
+        """Write the snapshot (plus ``extra``) to ``path`` atomically as JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"timestamp": time.time(), **self.snapshot(), **(extra or {})}
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+stage_metrics = StageMetrics(enabled=os.getenv("STAGE_METRICS", "1") == "1")
@@ -0,0 +1,146 @@
+import argparse
+import json
+from typing import Any
+
+import numpy as np
+
+from mcp_copilot.index import CatalogIndex, top_k_indices
+
+VECTOR_STORAGES = ("float32", "float16", "int8")
+
+
+class QuantizedMatrix:
+    """Reduced-precision copy of a float32 matrix for a fast first scoring pass.
+
+    ``float16`` halves the memory of every row; ``int8`` quarters it, with one
+    float32 scale per row (``row ~= data * scale``). Dot products are computed
+    in float32 over bounded chunks, so the full matrix is never upcast at once.
+    """
+
+    def __init__(self, data: np.ndarray, scales: np.ndarray | None, chunk: int = 4096):
+        self.data = data
+        self.scales = scales
+        self.chunk = chunk
+
+    @property
+    def storage(self) -> str:
+        return str(self.data.dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @classmethod
+    def from_float32(
+        cls, matrix: np.ndarray, storage: str, chunk: int = 4096
+    ) -> "QuantizedMatrix":
+        if storage == "float16":
+            data = np.empty(matrix.shape, dtype=np.float16)
+            for start in range(0, matrix.shape[0], chunk):
+                data[start : start + chunk] = matrix[start : start + chunk]
+            return cls(data, None, chunk)
+        if storage == "int8":
+            data = np.empty(matrix.shape, dtype=np.int8)
+            scales = np.zeros(matrix.shape[0], dtype=np.float32)
+            for start in range(0, matrix.shape[0], chunk):
+                block = np.asarray(matrix[start : start + chunk], dtype=np.float32)
+                block_scales = np.abs(block).max(axis=1) / 127
+                safe = np.where(block_scales > 0, block_scales, 1)
+                data[start : start + chunk] = np.rint(block / safe[:, None])
+                scales[start : start + chunk] = block_scales
+            return cls(data, scales, chunk)
+        raise ValueError(
+            f"Unknown vector storage '{storage}', expected one of {VECTOR_STORAGES}"
+        )
+
+    def dot(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Approximate ``matrix @ query`` (restricted to ``rows`` if given)."""
+        data = self.data if rows is None else self.data[rows]
+        scores = np.empty(data.shape[0], dtype=np.float32)
+        for start in range(0, data.shape[0], self.chunk):
+            block = data[start : start + self.chunk].astype(np.float32)
+            scores[start : start + self.chunk] = block @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+
+def quantization_report(
+    index: CatalogIndex,
+    storages: tuple[str, ...] = VECTOR_STORAGES,
+    k: int = 10,
+    rescore_factor: int = 4,
+    sample: int = 200,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """Memory of the tool matrix and tool recall@k for each storage, side by side.
+
+    Queries are tool vectors sampled from the index itself, with a little noise
+    so they are not exact duplicates of a row. ``recall`` is the quantized
+    first pass alone; ``rescored_recall`` rescores the best
+    ``rescore_factor * k`` candidates in float32, as the matcher does.
+    """
+    matrix = index.tool_matrix
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(
+        matrix.shape[0], size=min(sample, matrix.shape[0]), replace=False
+    )
+    queries = np.asarray(matrix[np.sort(picks)], dtype=np.float32)
+    queries += rng.normal(
+        scale=0.05 / np.sqrt(max(matrix.shape[1], 1)), size=queries.shape
+    )
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    expected = [set(top_k_indices(matrix @ q, k).tolist()) for q in queries]
+    report = []
+    for storage in storages:
+        if storage == "float32":
+            report.append(
+                {
+                    "storage": storage,
+                    "bytes": int(matrix.nbytes),
+                    "recall": 1.0,
+                    "rescored_recall": 1.0,
+                }
+            )
+            continue
+        quantized = QuantizedMatrix.from_float32(matrix, storage)
+        found = rescored = 0
+        for q, exact in zip(queries, expected):
+            approx = quantized.dot(q)
+            found += len(exact & set(top_k_indices(approx, k).tolist()))
+            candidates = top_k_indices(approx, rescore_factor * k)
+            best = candidates[top_k_indices(matrix[candidates] @ q, k)]
+            rescored += len(exact & set(best.tolist()))
+        total = sum(len(e) for e in expected) or 1
+        report.append(
+            {
+                "storage": storage,
+                "bytes": int(quantized.nbytes),
+                "recall": found / total,
+                "rescored_recall": rescored / total,
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare memory and recall of quantized tool vectors."
+    )
+    parser.add_argument("data_path", help="mcp_arg_*.json catalog or .meta.json index")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+    print(
+        json.dumps(
+            quantization_report(
+                CatalogIndex.from_path(args.data_path),
+                k=args.k,
+                rescore_factor=args.rescore_factor,
+                sample=args.sample,
+            ),
+            indent=2,
+        )
+    )
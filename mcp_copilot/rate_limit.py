@@ -0,0 +1,345 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+import openai
+
+from mcp_copilot.metrics import stage_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+_Waiter = tuple[asyncio.AbstractEventLoop, asyncio.Future]
+
+# longest Retry-After that is honoured; a provider asking for more is treated
+# as an outage and the call fails instead of stalling
+MAX_RETRY_AFTER = 60.0
+
+
+def _remaining(deadline: float | None) -> float | None:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _wait_timeout(delay: float | None, remaining: float | None) -> float | None:
+    """How long to wait for ``delay`` (``None``: until a release) within
+    ``remaining`` seconds; raises ``TimeoutError`` if it does not fit."""
+    if remaining is None:
+        return delay
+    if remaining <= 0 or (delay is not None and delay > remaining):
+        raise TimeoutError("rate limited for longer than the caller can wait")
+    return remaining if delay is None else delay
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds the provider asked to wait (``Retry-After[-Ms]``), if it said so."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for header, divisor in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) / divisor)
+        except ValueError:
+            pass
+    try:
+        date = email.utils.parsedate_tz(headers.get("retry-after") or "")
+        return max(0.0, email.utils.mktime_tz(date) - time.time()) if date else None
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def is_throttled(error: BaseException) -> bool:
+    return isinstance(error, openai.RateLimitError) or (
+        getattr(error, "status_code", None) == 429
+    )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Throttling, timeouts, dropped connections and server errors."""
+    if is_throttled(error):
+        return True
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status >= 500 or status in (408, 409))
+
+
+class AdaptiveRateLimiter:
+    """Token bucket plus an AIMD concurrency limit for one API endpoint.
+
+    Every request takes a token (``rate`` per second, up to ``burst`` saved
+    up; ``rate=0`` disables the bucket) and an in-flight slot. The number of
+    slots grows by about one per window of successful requests and is halved
+    on a 429, between ``min_concurrency`` and ``max_concurrency``; 429s for
+    requests sent before the last decrease do not halve it again. A
+    ``Retry-After`` from the provider pauses every caller until it has passed.
+
+    The limiter is thread-safe and can be shared by synchronous callers
+    (``call``) and coroutines on any event loop (``acall``). Latency-bound
+    callers pass ``max_wait``: when the slot, a pause or a retry would take
+    longer than that, the call fails at once instead of stalling.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: int | None = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        initial_concurrency: int | None = None,
+        max_backoff: float = 30.0,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst or int(rate) or 1)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(initial_concurrency or self.max_concurrency)
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._async_waiters: set[_Waiter] = set()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self.in_flight = 0
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+
+    def _reserve(self) -> float | None:
+        """Take a slot and a token: 0 on success, else seconds to wait or
+        ``None`` to wait for a release. Called with the lock held."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.rate > 0:
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled_at) * self.rate
+            )
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self.in_flight += 1
+        self.requests += 1
+        return 0.0
+
+    def acquire(self, deadline: float | None = None) -> float:
+        """Wait for a slot and a token; returns when the slot was granted.
+
+        Raises ``TimeoutError`` if that cannot happen by ``deadline``
+        (``time.monotonic()``).
+        """
+        start = time.monotonic()
+        with self._lock:
+            while (delay := self._reserve()) != 0.0:
+                self._released.wait(_wait_timeout(delay, _remaining(deadline)))
+        return self._record_wait(start)
+
+    async def aacquire(self, deadline: float | None = None) -> float:
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                delay = self._reserve()
+                if delay == 0.0:
+                    break
+                timeout = _wait_timeout(delay, _remaining(deadline))
+                waiter = (loop, loop.create_future())
+                self._async_waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1], timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    self._async_waiters.discard(waiter)
+        return self._record_wait(start)
+
+    def release(
+        self, started: float, throttled: bool = False, delay: float | None = None
+    ) -> None:
+        """Free the slot granted at ``started``; ``throttled`` backs off,
+        otherwise the limit grows."""
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                if delay:
+                    self._paused_until = max(self._paused_until, now + delay)
+                if started >= self._decreased_at:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._decreased_at = now
+                    logger.info(
+                        f"{self.name}: throttled, concurrency limit "
+                        f"lowered to {int(self.limit)}"
+                    )
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._released.notify_all()
+            waiters, self._async_waiters = self._async_waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _record_wait(self, start: float) -> float:
+        now = time.monotonic()
+        if now - start > 0.001:
+            with self._lock:
+                self.wait_seconds += now - start
+            stage_metrics.observe(f"rate_limit.{self.name}.wait", now - start)
+        return now
+
+    def _backoff(self, attempt: int, error: BaseException) -> float | None:
+        """Seconds to sleep before retrying, or ``None`` to give up."""
+        delay = retry_after(error)
+        if delay is not None:
+            return delay if delay <= MAX_RETRY_AFTER else None
+        # full jitter, so throttled callers do not retry in lockstep
+        return random.uniform(0, min(self.max_backoff, 0.5 * 2**attempt))
+
+    def _failed(
+        self,
+        started: float,
+        attempt: int,
+        max_retries: int,
+        error: BaseException,
+        deadline: float | None = None,
+    ) -> float | None:
+        """Release after a failed call; the retry delay, or ``None`` to raise."""
+        throttled = is_throttled(error)
+        delay = self._backoff(attempt, error) if is_retryable(error) else None
+        self.release(started, throttled, delay if throttled else None)
+        remaining = _remaining(deadline)
+        if (
+            delay is None
+            or attempt >= max_retries - 1
+            or (remaining is not None and delay > remaining)
+        ):
+            with self._lock:
+                self.failures += 1
+            return None
+        with self._lock:
+            self.retries += 1
+        logger.warning(
+            f"{self.name}: {type(error).__name__}, retry {attempt + 1} "
+            f"in {delay:.2f}s: {error}"
+        )
+        return delay
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        max_retries: int = 3,
+        max_wait: float | None = None,
+    ) -> T:
+        """Run ``fn`` under the limiter, retrying retryable API errors.
+
+        With ``max_wait``, waiting for the limiter and between retries may take
+        at most that many seconds in total; otherwise the last error, or a
+        ``TimeoutError`` if ``fn`` never ran, is raised.
+        """
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        for attempt in range(max(1, max_retries)):
+            started = self.acquire(deadline)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._failed(started, attempt, max_retries, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.release(started)
+            return result
+        raise AssertionError("unreachable")
+
+    async def acall(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        max_retries: int = 3,
+        max_wait: float | None = None,
+    ) -> T:
+        """Async counterpart of ``call``."""
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        for attempt in range(max(1, max_retries)):
+            started = await self.aacquire(deadline)
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.release(started)
+                raise
+            except Exception as e:
+                delay = self._failed(started, attempt, max_retries, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.release(started)
+            return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "failures": self.failures,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(name: str) -> AdaptiveRateLimiter:
+    """The process-wide limiter for ``name`` (``embedding``, ``summary``, ...).
+
+    Configured from ``<NAME>_RATE_LIMIT_RPS`` (0 = no bucket),
+    ``<NAME>_RATE_LIMIT_BURST`` and ``<NAME>_RATE_LIMIT_CONCURRENCY``.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            prefix = name.upper()
+            limiter = _limiters[name] = AdaptiveRateLimiter(
+                name,
+                rate=float(os.getenv(f"{prefix}_RATE_LIMIT_RPS", 0)),
+                burst=int(os.getenv(f"{prefix}_RATE_LIMIT_BURST", 0)) or None,
+                max_concurrency=int(os.getenv(f"{prefix}_RATE_LIMIT_CONCURRENCY", 16)),
+            )
+        return limiter
+
+
+def rate_limit_stats() -> dict[str, dict[str, Any]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in sorted(limiters.items())}
@@ -1,16 +1,24 @@
 import asyncio
+import copy
 import json
 import logging
 import os
+import time
 from pathlib import Path
 from typing import Any
 
 import mcp.types as types
 import yaml
+from cachetools import LRUCache
 from dotenv import load_dotenv
 
+from mcp_copilot.connection_pool import ConnectionPool
+from mcp_copilot.embedding_cache import EmbeddingCache, normalize_text
+from mcp_copilot.index import source_signature, split_categories
 from mcp_copilot.matcher import ToolMatcher
 from mcp_copilot.mcp_connection import MCPConnection
+from mcp_copilot.metrics import stage_metrics
+from mcp_copilot.rate_limit import rate_limit_stats
 from mcp_copilot.schemas import Server, ServerConfig
 
 load_dotenv()
@@ -54,12 +62,34 @@ class Router:
         for name, config_data in self.config.get("mcpServers", {}).items():
             self.servers[name] = Server(name=name, config=ServerConfig(**config_data))
 
+        # 查询向量缓存，EMBEDDING_CACHE_PATH 设置后会持久化到 SQLite
+        embedding_cache = EmbeddingCache(
+            maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", 1024)),
+            ttl=float(os.getenv("EMBEDDING_CACHE_TTL", 0)),
+            store_path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+        )
+
         # 初始化 ToolMatcher
         self.matcher = ToolMatcher(
             embedding_model=os.getenv("EMBEDDING_MODEL"),
             dimensions=int(os.getenv("EMBEDDING_DIMENSIONS")),
             top_servers=int(os.getenv("TOP_SERVERS", 5)),
             top_tools=int(os.getenv("TOP_TOOLS", 3)),
+            embedding_cache=embedding_cache,
+            search_backend=os.getenv("MATCHER_SEARCH_BACKEND", "exact"),
+            ann_params={
+                "n_lists": int(os.getenv("ANN_N_LISTS", 0)) or None,
+                "nprobe": int(os.getenv("ANN_NPROBE", 8)),
+            },
+            retrieval_mode=os.getenv("RETRIEVAL_MODE", "dense"),
+            lexical_weight=float(os.getenv("LEXICAL_WEIGHT", 0.3)),
+            lexical_fallback=os.getenv("LEXICAL_FALLBACK", "1") == "1",
+            embedding_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 256)),
+            search_mode=os.getenv("MATCHER_SEARCH_MODE", "two_stage"),
+            vector_storage=os.getenv("VECTOR_STORAGE", "float32"),
+            rescore_factor=int(os.getenv("RESCORE_FACTOR", 4)),
+            reduce_dimensions=os.getenv("EMBEDDING_REDUCE_DIMENSIONS", "0") == "1",
+            embedding_max_wait=float(os.getenv("EMBEDDING_MAX_WAIT", 2)) or None,
         )
 
         # 从环境变量中获取API密钥和数据路径
@@ -78,14 +108,102 @@ class Router:
             raise ValueError(f"MCP_DATA_PATH not set or file not found at: {data_path}")
 
         self.matcher.setup_openai_client(base_url=base_url, api_key=api_key)
+        self.data_path = Path(data_path)
+        self._index_signature = source_signature(self.data_path)
         self.matcher.load_data(data_path)
 
-        # 新增：初始化一个锁来同步连接过程
-        self.connection_lock = asyncio.Lock()
+        # 索引热加载：轮询索引文件，变化后在后台线程重建并原子替换
+        self.index_reload_interval = float(os.getenv("INDEX_RELOAD_INTERVAL", 5))
+        self._index_watcher: asyncio.Task | None = None
+        self._failed_signature = None
+
+        # 路由结果缓存，键为 (规范化查询, 索引指纹, top_servers, top_tools)
+        route_cache_size = int(os.getenv("ROUTE_CACHE_SIZE", 1024))
+        self.route_cache = LRUCache(route_cache_size) if route_cache_size > 0 else None
+        self.route_cache_hits = 0
+        self.route_cache_misses = 0
+
+        # 分阶段耗时统计，设置 STATS_DUMP_PATH 后定期写入文件
+        self.stats_dump_path = os.getenv("STATS_DUMP_PATH") or None
+        self.stats_dump_interval = float(os.getenv("STATS_DUMP_INTERVAL", 60))
+        self._stats_dumper: asyncio.Task | None = None
+
+        # 每个服务器一个信号量限制并发调用（FIFO 排队），
+        # 服务器配置中的 max_concurrency 覆盖 SERVER_MAX_CONCURRENCY
+        self.server_max_concurrency = int(os.getenv("SERVER_MAX_CONCURRENCY", 4))
+        self._server_slots: dict[str, asyncio.Semaphore] = {}
+        self._queued: dict[str, int] = {}
+        self._running: dict[str, int] = {}
+
+        # 同时运行的服务器进程总数上限
+        max_processes = int(os.getenv("MAX_SERVER_PROCESSES", 16))
+        self.process_slots = asyncio.Semaphore(max(1, max_processes))
+
+        # 连接池：复用已建立的服务器连接，CONNECTION_POOL_SIZE=0 时每次调用新建连接
+        pool_size = int(os.getenv("CONNECTION_POOL_SIZE", max_processes))
+        self.connection_pool = (
+            ConnectionPool(
+                self.servers,
+                max_size=min(pool_size, max_processes),
+                idle_ttl=float(os.getenv("CONNECTION_IDLE_TTL", 300)),
+                health_check_interval=float(
+                    os.getenv("CONNECTION_HEALTH_CHECK_INTERVAL", 30)
+                ),
+            )
+            if pool_size > 0
+            else None
+        )
+
+    def _route_cache_key(self, query: str, category: str | None) -> tuple:
+        return (
+            normalize_text(query),
+            tuple(sorted(split_categories(category))),
+            self.matcher.index.fingerprint,
+            self.matcher.top_servers,
+            self.matcher.top_tools,
+        )
+
+    async def _route_cached(
+        self, query: str, category: str | None = None
+    ) -> tuple[dict[str, Any], str]:
+        """返回 (路由结果, YAML)，命中缓存时无需任何 embedding 或打分计算。
+
+        缓存键包含索引指纹，索引热加载后旧条目自然失效；失败或降级的结果不缓存。
+        """
+        with stage_metrics.time("router.route"):
+            key = self._route_cache_key(query, category)
+            cached = self.route_cache.get(key) if self.route_cache is not None else None
+            if cached is not None:
+                self.route_cache_hits += 1
+                return cached
+            self.route_cache_misses += 1
+            result = await self.matcher.amatch(query, category=category)
+            with stage_metrics.time("router.yaml"):
+                entry = (result, dump_to_yaml(result))
+        if (
+            self.route_cache is not None
+            and result.get("success")
+            and "fallback" not in result
+        ):
+            self.route_cache[key] = entry
+        return entry
+
+    async def route(self, query: str, category: str | None = None) -> dict[str, Any]:
+        """使用ToolMatcher进行路由，找到最匹配的工具。
+
+        category 为可选的类别提示（逗号分隔），只在对应类别的分片中搜索。
+        """
+        result, _ = await self._route_cached(query, category)
+        return copy.deepcopy(result)
 
-    async def route(self, query: str) -> dict[str, Any]:
-        """使用ToolMatcher进行路由，找到最匹配的工具。"""
-        return self.matcher.match(query)
+    async def route_yaml(self, query: str, category: str | None = None) -> str:
+        """路由并返回 YAML 字符串，供 MCP route 工具直接使用。"""
+        _, text = await self._route_cached(query, category)
+        return text
+
+    async def route_batch(self, queries: list[str]) -> list[dict[str, Any]]:
+        """批量路由，结果与输入顺序一致，单条失败不影响其他查询。"""
+        return await self.matcher.amatch_many(queries)
 
     async def call_tool(
         self,
@@ -94,35 +212,187 @@ class Router:
         params: dict[str, Any] | None = None,
         timeout: int = 300,
     ) -> types.CallToolResult:
-        """在指定的服务器上执行工具，每次调用都建立新连接以确保上下文安全。"""
-        async with self.connection_lock:
-            server_config = self.servers.get(server_name)
-            if not server_config:
-                raise ValueError(
-                    f"Server '{server_name}' is not defined in the configuration."
+        """在指定的服务器上执行工具，连接来自连接池并在多次调用之间复用。"""
+        with stage_metrics.time("router.call_tool"):
+            return await self._call_tool(server_name, tool_name, params, timeout)
+
+    async def _call_tool(
+        self,
+        server_name: str,
+        tool_name: str,
+        params: dict[str, Any] | None,
+        timeout: int,
+    ) -> types.CallToolResult:
+        server_config = self.servers.get(server_name)
+        if not server_config:
+            raise ValueError(
+                f"Server '{server_name}' is not defined in the configuration."
+            )
+        slot = self._server_slot(server_name)
+        queue_wait = time.perf_counter()
+        self._queued[server_name] = self._queued.get(server_name, 0) + 1
+        try:
+            await slot.acquire()
+        finally:
+            self._queued[server_name] -= 1
+        stage_metrics.observe(
+            "router.call_tool.queue_wait", time.perf_counter() - queue_wait
+        )
+        self._running[server_name] = self._running.get(server_name, 0) + 1
+        try:
+            if self.connection_pool is not None:
+                # 连接池的容量即进程上限，满时在池内排队
+                return await asyncio.wait_for(
+                    self.connection_pool.call_tool(
+                        server_name, tool_name, params or {}
+                    ),
+                    timeout=timeout,
                 )
-            # 使用 async with 来管理连接的生命周期
-            # 现在整个过程都在锁的保护下，是线程安全的
-            async with MCPConnection(server_config) as connection:
-                try:
-                    result = await asyncio.wait_for(
+            # 使用 async with 来管理连接的生命周期，每次调用占用一个进程名额
+            async with self.process_slots:
+                async with MCPConnection(server_config) as connection:
+                    return await asyncio.wait_for(
                         connection.call_tool(tool_name, params or {}), timeout=timeout
                     )
-                    return result
-                except asyncio.TimeoutError:
-                    return types.CallToolResult(
-                        isError=True,
-                        content=[
-                            types.TextContent(
-                                text=f"Tool {tool_name} in {server_name} call timed out."
-                            )
-                        ],
+        except asyncio.TimeoutError:
+            return types.CallToolResult(
+                isError=True,
+                content=[
+                    types.TextContent(
+                        type="text",
+                        text=f"Tool {tool_name} in {server_name} call timed out.",
                     )
+                ],
+            )
+        finally:
+            self._running[server_name] -= 1
+            slot.release()
+
+    def _server_slot(self, server_name: str) -> asyncio.Semaphore:
+        slot = self._server_slots.get(server_name)
+        if slot is None:
+            limit = (
+                self.servers[server_name].config.max_concurrency
+                or self.server_max_concurrency
+            )
+            slot = self._server_slots[server_name] = asyncio.Semaphore(max(1, limit))
+        return slot
+
+    async def reload_index(self, force: bool = False) -> bool:
+        """如果索引文件发生变化，则在后台线程中重建索引并替换，返回是否已重新加载。"""
+        try:
+            signature = source_signature(self.data_path)
+        except OSError as e:
+            logger.warning(f"Cannot stat index file {self.data_path}: {e}")
+            return False
+        if not force and signature in (
+            self._index_signature,
+            self._failed_signature,
+        ):
+            return False
+        try:
+            index = await asyncio.to_thread(self.matcher.build_index, self.data_path)
+        except json.JSONDecodeError as e:
+            # 文件内容无法解析，保留旧索引，直到文件再次变化
+            logger.warning(f"Failed to parse index file {self.data_path}: {e}")
+            self._failed_signature = signature
+            return False
+        except Exception as e:
+            # 其他错误（如索引文件正被替换）可能是暂时的，下一次轮询重试
+            logger.warning(f"Failed to reload index from {self.data_path}: {e}")
+            return False
+        self.matcher.swap_index(index)
+        self._index_signature = signature
+        logger.info(
+            f"Reloaded {len(index)} servers and {index.num_tools} tools "
+            f"from {self.data_path}"
+        )
+        return True
+
+    def stats(self, reset: bool = False) -> dict[str, Any]:
+        """各阶段耗时直方图以及缓存、索引状态；reset 为 True 时清空耗时统计。"""
+        index = self.matcher.index
+        lookups = self.route_cache_hits + self.route_cache_misses
+        stats = {
+            **stage_metrics.snapshot(),
+            "route_cache": {
+                "size": len(self.route_cache) if self.route_cache is not None else 0,
+                "hits": self.route_cache_hits,
+                "misses": self.route_cache_misses,
+                "hit_rate": self.route_cache_hits / lookups if lookups else 0.0,
+            },
+            "embedding_cache": self.matcher.embedding_cache.stats(),
+            "rate_limits": rate_limit_stats(),
+            "call_queue": {
+                name: {
+                    "limit": self.servers[name].config.max_concurrency
+                    or self.server_max_concurrency,
+                    "running": self._running[name],
+                    "queued": self._queued.get(name, 0),
+                }
+                for name in sorted(self._running)
+                if self._running[name] or self._queued.get(name)
+            },
+            "connection_pool": (
+                self.connection_pool.stats()
+                if self.connection_pool is not None
+                else None
+            ),
+            "index": {
+                "servers": len(index),
+                "tools": index.num_tools,
+                "dimensions": index.dimensions,
+                "fingerprint": index.fingerprint,
+            },
+        }
+        if reset:
+            stage_metrics.reset()
+        return stats
+
+    def dump_stats(self) -> None:
+        try:
+            stage_metrics.dump(
+                self.stats_dump_path,
+                extra={k: v for k, v in self.stats().items() if k != "stages"},
+            )
+        except OSError as e:
+            logger.warning(f"Failed to write stats to {self.stats_dump_path}: {e}")
+
+    async def _dump_stats_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.stats_dump_interval)
+            self.dump_stats()
+
+    async def _watch_index(self) -> None:
+        while True:
+            await asyncio.sleep(self.index_reload_interval)
+            await self.reload_index()
 
     async def aclose(self):
-        pass
+        if self._index_watcher is not None:
+            self._index_watcher.cancel()
+            try:
+                await self._index_watcher
+            except asyncio.CancelledError:
+                pass
+            self._index_watcher = None
+        if self._stats_dumper is not None:
+            self._stats_dumper.cancel()
+            try:
+                await self._stats_dumper
+            except asyncio.CancelledError:
+                pass
+            self._stats_dumper = None
+            self.dump_stats()
+        if self.connection_pool is not None:
+            await self.connection_pool.aclose()
+        self.matcher.embedding_cache.close()
 
     async def __aenter__(self):
+        if self.index_reload_interval > 0 and self._index_watcher is None:
+            self._index_watcher = asyncio.create_task(self._watch_index())
+        if self.stats_dump_path and self._stats_dumper is None:
+            self._stats_dumper = asyncio.create_task(self._dump_stats_periodically())
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
@@ -10,6 +10,7 @@ class ServerConfig(BaseModel):
     env: dict[str, str] = {}
     url: str | None = None
     headers: dict[str, Any] = {}
+    max_concurrency: int | None = None
 
     @model_validator(mode="after")
     def check_command_or_url(self):
@@ -6,9 +6,11 @@ import asyncio
 import mcp.types as types
 from mcp.server.fastmcp import Context, FastMCP
 from mcp_copilot.router import Router, dump_to_yaml
-from mcp_copilot.arg_generation import run_generation
+from mcp_copilot.arg_generation import DEFAULT_OUTPUT_PATH, run_generation
+from mcp_copilot.metrics import stage_metrics
 
 import logging
+import os
 import sys
 
 logging.basicConfig(
@@ -19,20 +21,83 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# background: serve the existing index at once and regenerate it in a child
+#   process, hot-swapping the result in (blocking when there is no index yet)
+# blocking: regenerate before serving; off: serve the existing index as is
+INDEX_GENERATION = os.getenv("INDEX_GENERATION", "background")
+# expose the tools that are not meant for agents (route-batch, stats)
+COPILOT_DEBUG_TOOLS = os.getenv("COPILOT_DEBUG_TOOLS", "0") == "1"
+
+
+async def generate_in_background(router: Router) -> None:
+    """Regenerate the index with the arg_generation CLI, then swap it in.
+
+    The child process keeps summarizing and embedding off the server's event
+    loop; it gets no stdin and its stdout goes to stderr, so the stdio
+    transport stays clean. It exits at once when another copilot's run is
+    already indexing the same output. If the server stops first the child is
+    terminated and the next run resumes from its checkpoint log.
+    """
+    start = asyncio.get_running_loop().time()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "mcp_copilot.arg_generation",
+            "--no-wait",
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=sys.stderr,
+        )
+    except OSError as e:
+        logger.error(f"Failed to start background index generation: {e}")
+        return
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        process.terminate()
+        await process.wait()
+        raise
+    stage_metrics.observe(
+        "server.index_generation", asyncio.get_running_loop().time() - start
+    )
+    if returncode:
+        logger.warning(f"Background index generation exited with {returncode}")
+    elif await router.reload_index():
+        logger.info("Swapped in the regenerated index.")
+    else:
+        logger.info("Background index generation finished, index unchanged.")
+
+
 def serve(config: dict[str, Any] | Path = Router._default_config_path) -> None:
     """Run the copilot MCP server.
 
     Args:
         config: MCP Server config for Router
     """
-    logger.info("Initializing MCP servers and tools...")
-    asyncio.run(run_generation())
+    background = INDEX_GENERATION == "background"
+    data_path = Path(os.getenv("MCP_DATA_PATH", DEFAULT_OUTPUT_PATH))
+    if INDEX_GENERATION == "blocking" or (background and not data_path.exists()):
+        logger.info("Initializing MCP servers and tools...")
+        asyncio.run(run_generation())
+        background = False
 
     @asynccontextmanager
     async def copilot_lifespan(server: FastMCP) -> AsyncIterator[dict]:
         """Lifespan context manager for the Copilot server."""
         async with Router(config) as router:
-            yield {"router": router}
+            generation = None
+            if background:
+                logger.info("Regenerating the index in the background...")
+                generation = asyncio.create_task(generate_in_background(router))
+            try:
+                yield {"router": router}
+            finally:
+                if generation is not None:
+                    generation.cancel()
+                    try:
+                        await generation
+                    except asyncio.CancelledError:
+                        pass
 
     logger.info("Starting MCP Copilot server...")
     server = FastMCP("mcp-copilot", lifespan=copilot_lifespan)
@@ -52,18 +117,63 @@ def serve(config: dict[str, Any] | Path = Router._default_config_path) -> None:
         <tool_assistant>
         server: ... # Platform/permission domain
         tool: ... # Operation type + target
+        category: ... # Optional, e.g. Discovery, Code
         </tool_assistant>
+    Category (string, optional): Comma-separated server categories (e.g. Discovery, Code, File Access, Finance) to search in. Only servers of these categories are considered; unknown categories are ignored.
     """
         ),
     )
     async def route(
         query: str,
         ctx: Context,
+        category: str | None = None,
     ) -> types.CallToolResult:
         """Route user query to appropriate servers and tools."""
         router: Router = ctx.request_context.lifespan_context["router"]
-        result = await router.route(query)
-        return dump_to_yaml(result)
+        return await router.route_yaml(query, category=category)
+
+    # not for agents: only registered with COPILOT_DEBUG_TOOLS=1, so the tool
+    # set an agent sees stays route and execute-tool
+    if COPILOT_DEBUG_TOOLS:
+
+        @server.tool(
+            name="route-batch",
+            description=(
+                """
+        Batch version of the route tool for offline evaluation workloads.
+        **Parameter Description**
+        Queries (list of strings, required): Each query has the same format as the query of the route tool.
+        Results are returned in the same order as the queries; a failed query does not fail the batch.
+        """
+            ),
+        )
+        async def route_batch(
+            queries: list[str],
+            ctx: Context,
+        ) -> types.CallToolResult:
+            """Route a batch of user queries to appropriate servers and tools."""
+            router: Router = ctx.request_context.lifespan_context["router"]
+            results = await router.route_batch(queries)
+            return dump_to_yaml({"results": results})
+
+        @server.tool(
+            name="stats",
+            description=(
+                """
+        Latency statistics of the copilot itself, for diagnosing slow routing or tool execution.
+        Returns per-stage histograms (count, mean, p50/p90/p99, max in milliseconds) for the embedding request, server and tool search, YAML dumping, tool calls and MCP server spawn/initialize/list_tools, plus route and embedding cache hit rates.
+        **Parameter Description**
+        Reset (boolean, optional): Clear the histograms after reading them.
+        """
+            ),
+        )
+        async def stats(
+            ctx: Context,
+            reset: bool = False,
+        ) -> types.CallToolResult:
+            """Report per-stage timing histograms and cache statistics."""
+            router: Router = ctx.request_context.lifespan_context["router"]
+            return dump_to_yaml(router.stats(reset=reset))
 
     @server.tool(
         name="execute-tool",